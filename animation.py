@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse, multiprocessing, os, sys
+
+import numpy as np
+
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+from PySide6.QtGui import QGuiApplication, QImage
+
+from h2geometry import H2Isometry, H2IsometryArray
+from renderer import Renderer
+from scene import Scene
+
+
+def expGenerators(X, t):
+    # exp(t X) for X in su(1,1) (trace zero) and an array of times, as (len(t), 2, 2) matrices.
+    # With d = -det X, exp(tX) = cosh(t sqrt(d)) I + sinh(t sqrt(d))/sqrt(d) X, for d < 0 as well.
+    t = np.asarray(t, dtype=np.float64).reshape(-1)
+    root = np.sqrt(complex(-np.linalg.det(X)))
+    if abs(root) < 1e-15:
+        c, s = np.ones(t.shape[0], dtype=np.complex128), t.astype(np.complex128)
+    else:
+        c, s = np.cosh(t*root), np.sinh(t*root)/root
+    return c[:, None, None]*np.eye(2) + s[:, None, None]*X
+
+def logIsometry(M):
+    # X in su(1,1) with exp(X) = M or -M (the same isometry), for M in SU(1,1)
+    if M[0, 0].real < 0:
+        M = -M
+    h = M[0, 0].real
+    s = np.arccosh(complex(h))
+    factor = 1.0 if abs(s) < 1e-15 else s/np.sinh(s)
+    return (factor*(M - h*np.eye(2))).astype(np.complex128)
+
+
+class H2Flow:
+    # One-parameter family of isometries t -> exp(t X) base, with X in su(1,1)
+    def __init__(self, generator, base=None):
+        self.generator = np.asarray(generator, dtype=np.complex128)
+        self.base = H2Isometry(1.0, 0.0) if base is None else base
+
+    @classmethod
+    def translation(cls, speed, direction=1.0):
+        # Hyperbolic translation along the geodesic through 0 in the given direction, by speed per unit time
+        d = direction/abs(direction)
+        return cls(0.5*speed*np.array([[0, d], [np.conj(d), 0]]))
+
+    @classmethod
+    def rotation(cls, speed, center=0.0):
+        # Elliptic rotation around center, by speed radians per unit time
+        X = 0.5*speed*np.array([[1j, 0], [0, -1j]])
+        T = H2IsometryArray.fromUA(1.0, -center).matrices[0]
+        return cls(T @ X @ np.linalg.inv(T))
+
+    @classmethod
+    def parabolic(cls, speed, fixedPoint=1.0):
+        # Parabolic isometries fixing the ideal point fixedPoint
+        p = fixedPoint/abs(fixedPoint)
+        return cls(0.5*speed*np.array([[1j, -1j*p], [1j*np.conj(p), -1j]]))
+
+    @classmethod
+    def between(cls, f, g):
+        # The flow going from f at t = 0 to g at t = 1 along the one-parameter subgroup through g f^-1
+        return cls(logIsometry((g*f.inverse()).matrix()), f)
+
+    def isometries(self, times):
+        flow = H2IsometryArray(expGenerators(self.generator, times))
+        return flow*H2IsometryArray.fromIsometries([self.base])
+
+    def at(self, t):
+        return self.isometries([t])[0]
+
+
+def flowTransforms(flow, nbFrames, duration=1.0, base=None):
+    # Transforms of nbFrames frames evenly spaced on [0, duration], each composed with base
+    transforms = flow.isometries(np.linspace(0.0, duration, nbFrames))
+    if base is not None:
+        transforms = transforms*H2IsometryArray.fromIsometries([base])
+    return transforms
+
+
+workerApp, workerRenderer, workerScene, workerImage, workerFormat = None, None, None, None, None
+
+def initWorker(source, view, outputFormat):
+    # The renderer, its caches and the frame image are kept for all the frames of a process. source is
+    # Scene.source(): scene files are mapped by each process rather than copied to it.
+    global workerApp, workerRenderer, workerScene, workerImage, workerFormat
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    if QGuiApplication.instance() is None:
+        workerApp = QGuiApplication([])
+    workerRenderer, workerScene, workerFormat = Renderer(), Scene.fromSource(source), outputFormat
+    workerRenderer.setView(view)
+    workerRenderer.pickingIndex, workerRenderer.reuseBuffers = False, True
+    workerImage = QImage(view[4], view[5], QImage.Format_RGB32)
+
+def encodeFrame(image, outputFormat):
+    if outputFormat == 'raw':
+        # Packed RGB24 rows, as read by e.g. ffmpeg -f rawvideo -pix_fmt rgb24
+        rgb = image.convertToFormat(QImage.Format_RGB888)
+        rows = np.frombuffer(rgb.constBits(), dtype=np.uint8).reshape(rgb.height(), rgb.bytesPerLine())
+        return rows[:, :3*rgb.width()].tobytes()
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, outputFormat.upper())
+    return bytes(data.data())
+
+def renderFrame(task):
+    index, u, a = task
+    workerRenderer.transform = H2Isometry(u, a)
+    workerRenderer.render(workerImage, workerScene)
+    return index, encodeFrame(workerImage, workerFormat)
+
+def renderAnimation(scene, transforms, view, output, processes=None):
+    # Renders one frame of the view (Renderer.viewKey) per transform (an H2IsometryArray or a list of
+    # H2Isometry). output is either a file name pattern such as 'frames/frame%05d.png', each frame
+    # being written to its own file, or a binary file object that receives the raw RGB24 frames one
+    # after the other (a pipe to a video encoder). Frames are rendered by a pool of headless processes
+    # and written in order as soon as they are ready.
+    if not isinstance(transforms, H2IsometryArray):
+        transforms = H2IsometryArray.fromIsometries(transforms)
+    u, a = transforms.toUA()
+    tasks = [(k, u[k], a[k]) for k in range(len(transforms))]
+    if isinstance(output, str):
+        outputFormat = os.path.splitext(output)[1][1:].lower() or 'png'
+    else:
+        outputFormat = 'raw'
+    pool = None
+    try:
+        if processes == 1:
+            initWorker(scene, view, outputFormat)
+            frames = map(renderFrame, tasks)
+        else:
+            pool = multiprocessing.get_context('spawn').Pool(processes, initWorker, (scene.source(), view, outputFormat))
+            frames = pool.imap(renderFrame, tasks)
+        for index, data in frames:
+            if isinstance(output, str):
+                with open(output % index, 'wb') as f:
+                    f.write(data)
+            else:
+                output.write(data)
+        if not isinstance(output, str):
+            output.flush()
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def main():
+    # render selects the offscreen platform when imported, so it is not imported with this module
+    from render import makeRenderer
+
+    parser = argparse.ArgumentParser(description='Render the frames of a scene moved by a flow of isometries')
+    parser.add_argument('scene', help='scene file (.npz or .grs)')
+    parser.add_argument('output', help="frame file pattern such as frames/frame%%05d.png, or '-' for raw RGB24 on stdout")
+    parser.add_argument('--flow', choices=['translation', 'rotation', 'parabolic'], default='translation')
+    parser.add_argument('--speed', type=float, default=1.0, help='distance, angle or parabolic speed per unit time')
+    parser.add_argument('--direction', type=float, default=0.0, help='angle of the translation direction, the rotation center or the fixed point')
+    parser.add_argument('--center', type=float, default=0.0, help='Euclidean radius of the rotation center')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=1.0)
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=800)
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: one per core)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QGuiApplication(sys.argv)
+    scene = Scene.load(args.scene)
+    direction = np.exp(1j*args.direction)
+    if args.flow == 'translation':
+        flow = H2Flow.translation(args.speed, direction)
+    elif args.flow == 'rotation':
+        flow = H2Flow.rotation(args.speed, args.center*direction)
+    else:
+        flow = H2Flow.parabolic(args.speed, direction)
+    view = makeRenderer(scene, args.width, args.height).viewKey()
+    transforms = flowTransforms(flow, args.frames, args.duration, scene.transform)
+    output = sys.stdout.buffer if args.output == '-' else args.output
+    renderAnimation(scene, transforms, view, output, args.processes)
+
+if __name__ == '__main__':
+    main()
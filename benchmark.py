@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse, json, os, platform, sys, time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+import PySide6
+from PySide6.QtWidgets import QApplication
+
+from h2geometry import H2Isometry, H2IsometryArray, H2Point, H2PointArray, H2Segment, H2SegmentArray
+from graph import Graph
+from embedding import TutteEmbedding, polygonPositions
+from renderer import Renderer
+from canvas import Canvas
+
+
+def timeCall(function, repeat, minTime=0.05):
+    # Seconds per call: each of the repeat samples runs function enough times to last minTime
+    number, elapsed = 1, 0.0
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= minTime or number >= 1 << 20:
+            break
+        number *= 2
+    samples = [elapsed/number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start)/number)
+    return {'median': float(np.median(samples)), 'min': float(np.min(samples)), 'number': number, 'repeat': repeat}
+
+def randomDiskPoints(rng, n, rMax=0.99):
+    return np.sqrt(rng.random(n))*rMax*np.exp(2j*np.pi*rng.random(n))
+
+def randomIsometries(rng, n, rMax=0.9):
+    return [H2Isometry(np.exp(2j*np.pi*rng.random()), z) for z in randomDiskPoints(rng, n, rMax)]
+
+
+def kernelBenchmarks(rng, repeat, nameFilter=''):
+    # Only the benchmarks whose name contains nameFilter are timed
+    results = {}
+
+    def bench(name, function):
+        if nameFilter in name:
+            results[name] = timeCall(function, repeat)
+
+    n = 1000
+    f, g = randomIsometries(rng, 2)
+    points = [H2Point(z) for z in randomDiskPoints(rng, n)]
+    pointArray = H2PointArray.fromPoints(points)
+    bench('kick[scalar x1000]', lambda: [f.kick(p) for p in points])
+    bench('kickMany[1000]', lambda: f.kickMany(pointArray))
+    bench('mul[scalar x1000]', lambda: [f*g for _ in range(n)])
+    bench('inverse[scalar x1000]', lambda: [f.inverse() for _ in range(n)])
+    stack1, stack2 = H2IsometryArray.fromIsometries(randomIsometries(rng, n)), H2IsometryArray.fromIsometries(randomIsometries(rng, n))
+    bench('H2IsometryArray.mul[1000]', lambda: stack1*stack2)
+    bench('H2IsometryArray.inverse[1000]', lambda: stack1.inverse())
+
+    z1, z2 = randomDiskPoints(rng, n), randomDiskPoints(rng, n)
+    segments = [H2Segment(H2Point(a), H2Point(b)) for a, b in zip(z1, z2)]
+    segmentArray = H2SegmentArray(H2PointArray(z1), H2PointArray(z2))
+    bench('getCircleAndEndpoints[scalar x1000]', lambda: [s.getCircleAndEndpoints() for s in segments])
+    bench('getCirclesAndEndpoints[1000]', lambda: segmentArray.getCirclesAndEndpoints())
+
+    # Arcs seen through a zoomed window near the boundary, so that many of them cross the canvas edges
+    renderer = Renderer(800, 800)
+    renderer.setWindow(0.5, 0.5, 0.5, 0.5)
+    straight, c, r, a, b = segmentArray.getCirclesAndEndpoints()
+    arcs = np.flatnonzero(~straight)
+    c, r, a, b = c[arcs], r[arcs], a[arcs], b[arcs]
+    arcList = list(zip(c, r, a, b))
+    bench('arcIntersectsCanvasBoundary[scalar x{}]'.format(len(arcList)),
+          lambda: [renderer.arcIntersectsCanvasBoundary(*arc) for arc in arcList])
+    bench('straightApprox[scalar x{}]'.format(len(arcList)),
+          lambda: [renderer.straightApprox(*arc) for arc in arcList])
+    bench('arcsIntersectCanvasBoundary[{}]'.format(len(arcList)), lambda: renderer.arcsIntersectCanvasBoundary(c, r, a, b))
+    bench('straightApproxMany[{}]'.format(len(arcList)), lambda: renderer.straightApproxMany(c, r, a, b))
+    return results
+
+
+def gridScene(nbEdges):
+    # Tutte embedding of a square grid with about nbEdges edges, scaled into the disk
+    m = max(int(round(0.5 + np.sqrt(0.25 + nbEdges/2.0))), 2)
+    graph = Graph.grid(m, m)
+    graph.setBoundary(graph.outerCycle, polygonPositions(graph.outerCycle.shape[0], 0.995))
+    return graph, TutteEmbedding(graph).solveDirect()
+
+# (name, window (xMin, yMax, width, height) or None for the whole disk, isometry)
+frameViews = [
+    ('full', None, H2Isometry(1.0, 0.0)),
+    ('zoom4', (0.45, 0.25, 0.5, 0.5), H2Isometry(1.0, 0.0)),
+    ('zoom16', (0.85, 0.0625, 0.125, 0.125), H2Isometry(1.0, 0.0)),
+    ('boundary0.9', None, H2Isometry(1.0, 0.9)),
+    ('boundary0.99', None, H2Isometry(1.0, 0.99)),
+]
+
+def frameBenchmarks(rng, repeat, maxEdges, nameFilter=''):
+    # Complete Canvas.paint() frames, the layers are invalidated and the isometry reassigned before
+    # each one, as when the transform is dragged
+    results = {}
+    canvas = Canvas(threaded=False)
+    renderer = canvas.renderer
+    for exponent in range(2, int(np.log10(maxEdges)) + 1):
+        names = ['paint[1e{}, {}]'.format(exponent, name) for name, _, _ in frameViews]
+        if not any(nameFilter in name for name in names):
+            continue
+        graph, positions = gridScene(10**exponent)
+        canvas.showH2Graph(positions, graph.edges)
+        for benchmark, (name, window, transform) in zip(names, frameViews):
+            if nameFilter not in benchmark:
+                continue
+            renderer.resetView(renderer.sizeX, renderer.sizeY)
+            if window is not None:
+                renderer.setWindow(*window)
+
+            def frame():
+                renderer.transform = H2Isometry(transform.u, transform.a)
+                canvas.staticLayer.invalidate()
+                canvas.hyperbolicLayer.invalidate()
+                canvas.paint()
+
+            results[benchmark] = timeCall(frame, repeat, minTime=0.0)
+    canvas.close()
+    return results
+
+
+def compare(results, baseline, threshold, out=sys.stderr):
+    # Ratios of the medians to the baseline, returns the names slower than threshold times the baseline.
+    # The table goes to stderr by default, stdout may be carrying the JSON report.
+    regressions = []
+    print('{:<48} {:>12} {:>12} {:>8}'.format('benchmark', 'baseline', 'current', 'ratio'), file=out)
+    for name, result in results.items():
+        if name not in baseline:
+            print('{:<48} {:>12} {:>12.6f} {:>8}'.format(name, '-', result['median'], 'new'), file=out)
+            continue
+        ratio = result['median']/baseline[name]['median']
+        flag = ' <- regression' if ratio > threshold else ''
+        print('{:<48} {:>12.6f} {:>12.6f} {:>8.2f}{}'.format(name, baseline[name]['median'], result['median'], ratio, flag), file=out)
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the geometry kernels and full frame rendering')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with the results saved in this JSON file')
+    parser.add_argument('--threshold', type=float, default=1.2, help='median ratio above which a benchmark regressed')
+    parser.add_argument('--max-edges', type=float, default=1e6)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--filter', default='', help='only run the benchmarks whose name contains this')
+    parser.add_argument('--kernels-only', action='store_true')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    rng = np.random.default_rng(0)
+    results = kernelBenchmarks(rng, args.repeat, args.filter)
+    if not args.kernels_only:
+        results.update(frameBenchmarks(rng, args.repeat, args.max_edges, args.filter))
+    report = {'meta': {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                       'numpy': np.__version__, 'pyside': PySide6.__version__, 'platform': platform.platform(),
+                       'processor': platform.processor()},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        print(json.dumps(report, indent=1))
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
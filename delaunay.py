@@ -0,0 +1,297 @@
+import numpy as np
+from scipy.spatial import ConvexHull, QhullError
+
+from toolkit import qnorm
+from h2geometry import H2PointArray, H2SegmentArray
+
+INFINITE = -1
+
+
+def liftToHyperboloid(z):
+    # Disk points to the hyperboloid x0^2 - x1^2 - x2^2 = 1, as rows (x1, x2, x0)
+    n = qnorm(z)
+    return np.column_stack((2*z.real, 2*z.imag, 1.0 + n))/(1.0 - n)[:, None]
+
+def kleinToPoincare(k):
+    return k/(1.0 + np.sqrt(np.maximum(1.0 - qnorm(k), 0.0)))
+
+def facePlanes(X, triangles):
+    # (alpha1, alpha2, beta) of the planes x0 = alpha1*x1 + alpha2*x2 + beta through the lifted triangles.
+    # The circle cut on the hyperboloid is centered at (alpha1, alpha2) in the Klein model, it is a
+    # hyperbolic circle when that center is in the disk and a horocycle or hypercycle otherwise.
+    corners = X[triangles]
+    A = np.concatenate((corners[:, :, :2], np.ones(corners.shape[:2] + (1,))), axis=2)
+    return np.linalg.solve(A, corners[:, :, 2:])[:, :, 0]
+
+def orientation(a, b, p):
+    return (b[0] - a[0])*(p[1] - a[1]) - (b[1] - a[1])*(p[0] - a[0])
+
+
+class H2Delaunay:
+    # Hyperbolic Delaunay triangulation of points of the disk. The lower convex hull of the points
+    # lifted to the hyperboloid, projected to (x1, x2), is the Euclidean Delaunay triangulation of the
+    # Poincare disk coordinates; the hyperbolic one is the part of it with empty circles inside the disk.
+    # It is built with qhull and kept up to date by local (Bowyer-Watson) insertions. Triangles are
+    # counterclockwise in (x1, x2), each hull edge has a ghost triangle with the vertex INFINITE, and
+    # neighbors[t, k] is the triangle across the edge opposite to triangles[t, k].
+    def __init__(self, points=None):
+        z = np.zeros(0, dtype=np.complex128) if points is None else self.pointsToComplex(points)
+        self.build(z)
+
+    @staticmethod
+    def pointsToComplex(points):
+        if isinstance(points, H2PointArray):
+            return points.z.copy()
+        if len(points) > 0 and hasattr(points[0], 'z'):
+            return H2PointArray.fromPoints(points).z
+        return np.array(points, dtype=np.complex128).reshape(-1)
+
+    def build(self, z):
+        self.nbPoints = z.shape[0]
+        self.z = np.zeros(max(16, self.nbPoints), dtype=np.complex128)
+        self.z[:self.nbPoints] = z
+        self.X = np.zeros((self.z.shape[0], 3))
+        self.X[:self.nbPoints] = liftToHyperboloid(z)
+        self.triangles, self.neighbors = np.zeros((0, 3), dtype=np.int64), np.zeros((0, 3), dtype=np.int64)
+        self.planes, self.alive = np.zeros((0, 3)), np.zeros(0, dtype=bool)
+        self.free, self.last = [], 0
+        lower = self.lowerHull()
+        if lower is None:
+            return
+        X = self.X
+        clockwise = orientation(X[lower[:, 0]].T, X[lower[:, 1]].T, X[lower[:, 2]].T) < 0
+        lower[clockwise] = lower[clockwise][:, ::-1]
+        # Hull edges are the directed edges of lower faces whose reverse is not one
+        directed = np.concatenate([lower[:, [1, 2]], lower[:, [2, 0]], lower[:, [0, 1]]])
+        keys = self.edgeKeys(directed[:, 0], directed[:, 1])
+        outer = directed[~np.isin(keys, self.edgeKeys(directed[:, 1], directed[:, 0]))]
+        ghosts = np.column_stack((outer[:, 1], outer[:, 0], np.full(outer.shape[0], INFINITE)))
+        triangles = np.concatenate((lower, ghosts))
+        self.triangles = triangles
+        self.neighbors = self.adjacency(triangles)
+        self.planes = np.full((triangles.shape[0], 3), np.nan)
+        self.planes[:lower.shape[0]] = facePlanes(X, lower)
+        self.alive = np.ones(triangles.shape[0], dtype=bool)
+
+    def lowerHull(self):
+        # Lower faces of the hull of the lifted points, None while they do not span the plane
+        X = self.X[:self.nbPoints]
+        if self.nbPoints < 3 or np.linalg.matrix_rank(X[:, :2] - X[0, :2], tol=1e-12*np.abs(X[:, :2]).max()) < 2:
+            return None
+        if self.nbPoints == 3:
+            return np.array([[0, 1, 2]])
+        try:
+            hull = ConvexHull(X)
+        except QhullError:
+            # All the points on one circle, the lifted points are coplanar
+            hull = ConvexHull(X, qhull_options='QJ')
+        return hull.simplices[hull.equations[:, 2] < 0]
+
+    def edgeKeys(self, a, b):
+        n = self.z.shape[0] + 1
+        return (a + 1)*n + (b + 1)
+
+    def adjacency(self, triangles):
+        m = triangles.shape[0]
+        # Half-edge k of triangle t is the edge opposite to vertex k, its twin is the reversed edge
+        tails = triangles[:, [1, 2, 0]].T.reshape(-1)
+        heads = triangles[:, [2, 0, 1]].T.reshape(-1)
+        keys = self.edgeKeys(tails, heads)
+        order = np.argsort(keys)
+        twin = order[np.searchsorted(keys[order], self.edgeKeys(heads, tails))]
+        return (twin % m).reshape(3, m).T
+
+    def copy(self):
+        other = H2Delaunay.__new__(H2Delaunay)
+        other.__dict__.update(self.__dict__)
+        for name in ('z', 'X', 'triangles', 'neighbors', 'planes', 'alive'):
+            setattr(other, name, getattr(self, name).copy())
+        other.free = list(self.free)
+        return other
+
+    def __len__(self):
+        return self.nbPoints
+
+    def points(self):
+        return H2PointArray(self.z[:self.nbPoints])
+
+    def inConflict(self, t, x):
+        # Whether the lifted point x is below the plane of triangle t, i.e. in its circle. For a ghost
+        # triangle, whether x is strictly outside its hull edge, or on that edge.
+        triangle = self.triangles[t]
+        if INFINITE in triangle:
+            k = int(np.flatnonzero(triangle == INFINITE)[0])
+            u, v = self.X[triangle[(k + 1) % 3]], self.X[triangle[(k + 2) % 3]]
+            o = orientation(u, v, x)
+            scale = 1e-12*(abs(v[0] - u[0]) + abs(v[1] - u[1]))*(abs(x[0] - u[0]) + abs(x[1] - u[1]))
+            if o > scale:
+                return True
+            return abs(o) <= scale and np.dot(x[:2] - u[:2], v[:2] - u[:2]) > 0 and np.dot(x[:2] - v[:2], u[:2] - v[:2]) > 0
+        a1, a2, b = self.planes[t]
+        return x[2] < a1*x[0] + a2*x[1] + b - 1e-12*x[2]
+
+    def locate(self, x, samples=64):
+        # Jump and walk: the walk starts from the nearest of a few random triangles and the last one
+        # created, then crosses the edges that x is on the right of. Returns a triangle in conflict with x.
+        candidates = np.append(np.random.randint(self.alive.shape[0], size=samples), self.last)
+        candidates = candidates[self.alive[candidates]]
+        if candidates.shape[0] == 0:
+            candidates = np.flatnonzero(self.alive)
+        corners = self.triangles[candidates, 0]
+        corners = np.where(corners == INFINITE, self.triangles[candidates, 1], corners)
+        t = int(candidates[np.argmin((self.X[corners, 0] - x[0])**2 + (self.X[corners, 1] - x[1])**2)])
+        triangle = self.triangles[t].tolist()
+        if INFINITE in triangle:
+            t = int(self.neighbors[t, triangle.index(INFINITE)])
+        x = x[:2].tolist()
+        start = np.random.randint(3)
+        for _ in range(self.triangles.shape[0] + 1):
+            triangle = self.triangles[t].tolist()
+            if INFINITE in triangle:
+                return t
+            corners = self.X[triangle, :2].tolist()
+            for j in range(3):
+                k = (start + j) % 3
+                if orientation(corners[(k + 1) % 3], corners[(k + 2) % 3], x) < 0:
+                    t = int(self.neighbors[t, k])
+                    break
+            else:
+                return t
+        raise RuntimeError('H2Delaunay.locate did not terminate')
+
+    def newTriangle(self):
+        if self.free:
+            return self.free.pop()
+        m = self.triangles.shape[0]
+        # Capacity doubles, the unused slots are kept dead in the free list
+        self.triangles = np.concatenate((self.triangles, np.zeros((m + 1, 3), dtype=np.int64)))
+        self.neighbors = np.concatenate((self.neighbors, np.zeros((m + 1, 3), dtype=np.int64)))
+        self.planes = np.concatenate((self.planes, np.full((m + 1, 3), np.nan)))
+        self.alive = np.concatenate((self.alive, np.zeros(m + 1, dtype=bool)))
+        self.free.extend(range(2*m, m, -1))
+        return m
+
+    def addPoint(self, z):
+        if self.nbPoints == self.z.shape[0]:
+            self.z = np.concatenate((self.z, np.zeros(self.z.shape[0], dtype=np.complex128)))
+            self.X = np.concatenate((self.X, np.zeros(self.X.shape)))
+        i = self.nbPoints
+        self.z[i] = z
+        self.X[i] = liftToHyperboloid(np.array([z]))[0]
+        self.nbPoints += 1
+        return i
+
+    def insert(self, point):
+        # Inserts an H2Point (or complex) and returns its vertex index. Only the triangles whose circle
+        # contains the point are replaced.
+        z = complex(getattr(point, 'z', point))
+        if not self.alive.any():
+            self.addPoint(z)
+            self.build(self.z[:self.nbPoints].copy())
+            return self.nbPoints - 1
+        x = liftToHyperboloid(np.array([z]))[0]
+        t = self.locate(x)
+        for v in self.triangles[t]:
+            if v != INFINITE and abs(self.z[v] - z) < 1e-14:
+                return int(v)
+        i = self.addPoint(z)
+        x = self.X[i]
+        cavity, inCavity, tested, boundary = [t], {t}, {t}, []
+        for c in cavity:
+            for k in range(3):
+                n = int(self.neighbors[c, k])
+                if n not in tested:
+                    tested.add(n)
+                    if self.inConflict(n, x):
+                        cavity.append(n)
+                        inCavity.add(n)
+                        continue
+                if n not in inCavity:
+                    boundary.append((c, k, n))
+        boundary = [(int(self.triangles[c, (k + 1) % 3]), int(self.triangles[c, (k + 2) % 3]), n) for c, k, n in boundary]
+        for c in cavity:
+            self.alive[c] = False
+            self.free.append(c)
+        starts, ends, created = {}, {}, []
+        for a, b, n in boundary:
+            t = self.newTriangle()
+            self.triangles[t] = (a, b, i)
+            self.alive[t] = True
+            self.neighbors[t, 2] = n
+            # The outer neighbor pointed to c across the edge (b, a)
+            outer = self.triangles[n]
+            for j in range(3):
+                if outer[(j + 1) % 3] == b and outer[(j + 2) % 3] == a:
+                    self.neighbors[n, j] = t
+            starts[a], ends[b] = t, t
+            created.append(t)
+        for t in created:
+            a, b, _ = self.triangles[t]
+            self.neighbors[t, 0] = starts[b]
+            self.neighbors[t, 1] = ends[a]
+        finite = [t for t in created if INFINITE not in self.triangles[t]]
+        self.planes[created] = np.nan
+        if finite:
+            self.planes[finite] = facePlanes(self.X, self.triangles[finite])
+        self.last = finite[0] if finite else created[0]
+        return i
+
+    def finiteTriangles(self):
+        return np.flatnonzero(self.alive & (self.triangles != INFINITE).all(axis=1))
+
+    def hyperbolicTriangles(self):
+        # Triangles whose circumscribed circle is a hyperbolic circle
+        t = self.finiteTriangles()
+        return self.triangles[t[qnorm(self.planes[t, 0] + 1j*self.planes[t, 1]) < 1.0]]
+
+    def pencils(self):
+        # For every finite edge (a, b), the centers of its empty circles form a segment of the Klein model
+        # between the centers of its two triangles, or a ray outwards for a hull edge. Returns a, b and the
+        # part of that segment inside the disk, as Klein points k1, k2, and whether it is not empty (the
+        # edge is then a hyperbolic Delaunay edge, and the segment its dual Voronoi edge).
+        t = self.finiteTriangles()
+        triangles, neighbors = self.triangles[t], self.neighbors[t]
+        tails, heads = triangles[:, [1, 2, 0]].reshape(-1), triangles[:, [2, 0, 1]].reshape(-1)
+        across = neighbors.reshape(-1)
+        ghost = (self.triangles[across] == INFINITE).any(axis=1)
+        keep = (tails < heads) | ghost
+        tails, heads, across, ghost = tails[keep], heads[keep], across[keep], ghost[keep]
+        planes = np.repeat(self.planes[t, :2], 3, axis=0)[keep]
+        k1 = planes[:, 0] + 1j*planes[:, 1]
+        otherPlanes = self.planes[np.where(ghost, 0, across), :2]
+        d = np.where(ghost, 0, otherPlanes[:, 0] + 1j*otherPlanes[:, 1] - k1)
+        # Outward normal of a hull edge, the triangle is on the left of tail -> head
+        e = (self.X[heads, 0] - self.X[tails, 0]) + 1j*(self.X[heads, 1] - self.X[tails, 1])
+        d = np.where(ghost, -1j*e, d)
+        sMax = np.where(ghost, np.inf, 1.0)
+        # |k1 + s d| = 1
+        A, B, C = qnorm(d), (np.conj(k1)*d).real, qnorm(k1) - 1.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            root = np.sqrt(np.maximum(B*B - A*C, 0.0))
+            sLow = np.where(A > 0, (-B - root)/A, np.where(C < 0, -np.inf, np.inf))
+            sHigh = np.where(A > 0, (-B + root)/A, np.where(C < 0, np.inf, -np.inf))
+        sLow, sHigh = np.maximum(sLow, 0.0), np.minimum(sHigh, sMax)
+        inside = sLow < sHigh
+        sLow, sHigh = np.where(inside, sLow, 0.0), np.where(inside, sHigh, 0.0)
+        return tails, heads, k1 + sLow*d, k1 + sHigh*d, inside
+
+    def edges(self):
+        # Hyperbolic Delaunay edges as an (m, 2) array of vertex indices
+        tails, heads, _, _, inside = self.pencils()
+        return np.column_stack((tails[inside], heads[inside]))
+
+    def segments(self):
+        edges = self.edges()
+        z = self.z[:self.nbPoints]
+        return H2SegmentArray(H2PointArray(z[edges[:, 0]]), H2PointArray(z[edges[:, 1]]))
+
+    def voronoiVertices(self):
+        # Hyperbolic circumcenters of the hyperbolic triangles
+        t = self.finiteTriangles()
+        k = self.planes[t, 0] + 1j*self.planes[t, 1]
+        return H2PointArray(kleinToPoincare(k[qnorm(k) < 1.0]))
+
+    def voronoiSegments(self):
+        # Voronoi edges as geodesic segments, an edge going to infinity ends on the boundary circle
+        _, _, k1, k2, inside = self.pencils()
+        return H2SegmentArray(H2PointArray(kleinToPoincare(k1[inside])), H2PointArray(kleinToPoincare(k2[inside])))
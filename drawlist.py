@@ -0,0 +1,117 @@
+import numpy as np
+
+from PySide6.QtCore import QLineF, QPointF, QRectF
+from PySide6.QtGui import QColor, QImage, QPainterPath, QPen, QPolygonF
+
+
+class StyleGroup:
+    def __init__(self, color, width):
+        self.color = color
+        self.width = width
+        self.points = []
+        self.lines = []
+        self.arcs = []
+        self.ellipses = []
+        self.density = []
+
+    def clear(self):
+        self.points, self.lines, self.arcs, self.ellipses, self.density = [], [], [], [], []
+
+    def isEmpty(self):
+        return not (self.points or self.lines or self.arcs or self.ellipses or self.density)
+
+    def pointArray(self):
+        return np.concatenate(self.points) if self.points else np.zeros((0, 2))
+
+    def lineArray(self):
+        return np.concatenate(self.lines) if self.lines else np.zeros((0, 4))
+
+    def arcArray(self):
+        return np.concatenate(self.arcs) if self.arcs else np.zeros((0, 6))
+
+    def ellipseArray(self):
+        return np.concatenate(self.ellipses) if self.ellipses else np.zeros((0, 4))
+
+    def densityImage(self, sizeX, sizeY, alpha):
+        # Each primitive covers its pixel with opacity alpha, so k of them give 1 - (1 - alpha)**k
+        XY = np.concatenate(self.density)
+        X, Y = XY[:, 0].astype(np.int64), XY[:, 1].astype(np.int64)
+        inside = (X >= 0) & (X < sizeX) & (Y >= 0) & (Y < sizeY)
+        counts = np.bincount(Y[inside]*sizeX + X[inside], minlength=sizeX*sizeY)
+        # The pixel values only depend on the counts, they are looked up in a table indexed by count
+        coverage = 1.0 - (1.0 - alpha)**np.arange(counts.max() + 1)
+        r, g, b = self.color.red(), self.color.green(), self.color.blue()
+        premultiplied = [np.rint(coverage*v).astype(np.uint32) for v in (255, r, g, b)]
+        table = (premultiplied[0] << 24) | (premultiplied[1] << 16) | (premultiplied[2] << 8) | premultiplied[3]
+        pixels = np.ascontiguousarray(table[counts].reshape(sizeY, sizeX))
+        return QImage(pixels.data, sizeX, sizeY, 4*sizeX, QImage.Format_ARGB32_Premultiplied).copy()
+
+
+class DrawList:
+    # Opacity of one primitive accumulated with addDensity
+    densityAlpha = 0.35
+
+    def __init__(self):
+        self.groups = {}
+
+    def clear(self):
+        # The groups are kept from one frame to the next, only their primitives are dropped
+        for group in self.groups.values():
+            group.clear()
+
+    def group(self, color, width):
+        color = QColor(color)
+        key = (color.rgba(), width)
+        if key not in self.groups:
+            self.groups[key] = StyleGroup(color, width)
+        return self.groups[key]
+
+    def addPoints(self, X, Y, color=QColor('black'), width=1):
+        self.group(color, width).points.append(np.column_stack((X, Y)).reshape(-1, 2))
+
+    def addLines(self, X1, Y1, X2, Y2, color=QColor('black'), width=1):
+        self.group(color, width).lines.append(np.column_stack((X1, Y1, X2, Y2)).reshape(-1, 4))
+
+    def addArcs(self, X, Y, W, H, qtAngle, qtSpan, color=QColor('black'), width=1):
+        self.group(color, width).arcs.append(np.column_stack((X, Y, W, H, qtAngle, qtSpan)).reshape(-1, 6))
+
+    def addEllipses(self, X, Y, W, H, color=QColor('black'), width=1):
+        self.group(color, width).ellipses.append(np.column_stack((X, Y, W, H)).reshape(-1, 4))
+
+    def addDensity(self, X, Y, color=QColor('black'), width=1):
+        self.group(color, width).density.append(np.column_stack((X, Y)).reshape(-1, 2))
+
+    def write(self, writer):
+        # Same as flush, into a vectorexport writer
+        for group in self.groups.values():
+            if not group.isEmpty():
+                writer.writeGroup(group)
+        self.clear()
+
+    def flush(self, painter):
+        device = painter.device()
+        for group in self.groups.values():
+            if group.density:
+                painter.drawImage(0, 0, group.densityImage(device.width(), device.height(), self.densityAlpha))
+        for group in self.groups.values():
+            if group.isEmpty():
+                continue
+            pen = QPen(group.color)
+            pen.setWidth(group.width)
+            painter.setPen(pen)
+            if group.points:
+                painter.drawPoints(QPolygonF([QPointF(x, y) for x, y in group.pointArray().tolist()]))
+            if group.lines:
+                painter.drawLines([QLineF(x1, y1, x2, y2) for x1, y1, x2, y2 in group.lineArray().tolist()])
+            if group.arcs or group.ellipses:
+                path = QPainterPath()
+                arcs = group.arcArray()
+                X, Y, W, H, angle = arcs[:, 0], arcs[:, 1], arcs[:, 2], arcs[:, 3], arcs[:, 4]*np.pi/(180*16)
+                startX, startY = X + 0.5*W*(1.0 + np.cos(angle)), Y + 0.5*H*(1.0 - np.sin(angle))
+                for (x, y, w, h, angle, span), sX, sY in zip(arcs.tolist(), startX.tolist(), startY.tolist()):
+                    path.moveTo(sX, sY)
+                    path.arcTo(x, y, w, h, angle/16.0, span/16.0)
+                for x, y, w, h in group.ellipseArray().tolist():
+                    path.addEllipse(QRectF(x, y, w, h))
+                painter.drawPath(path)
+        self.clear()
@@ -0,0 +1,54 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+
+def polygonPositions(nb, radius=1.0):
+    return radius*np.exp(2j*np.pi*np.arange(nb)/nb)
+
+
+class TutteEmbedding:
+    # Barycentric embedding: each free vertex is the weighted average of its neighbours,
+    # the boundary vertices are fixed. Solves L_ff x_f = -L_fb x_b for the complex positions.
+    def __init__(self, graph):
+        if graph.boundary.shape[0] == 0:
+            raise ValueError('TutteEmbedding needs fixed boundary vertices')
+        self.graph = graph
+        n = graph.nbVertices
+        isFree = np.ones(n, dtype=bool)
+        isFree[graph.boundary] = False
+        self.free = np.flatnonzero(isFree)
+        L = graph.laplacian()
+        self.Lff = L[self.free][:, self.free].tocsc()
+        Lfb = L[self.free][:, graph.boundary]
+        self.rhs = -(Lfb @ graph.boundaryPositions)
+        self.factorization = None
+        self.iterations = 0
+
+    def positions(self, freePositions):
+        positions = np.zeros(self.graph.nbVertices, dtype=np.complex128)
+        positions[self.graph.boundary] = self.graph.boundaryPositions
+        positions[self.free] = freePositions
+        return positions
+
+    def solveDirect(self):
+        if self.factorization is None:
+            self.factorization = spla.splu(self.Lff, permc_spec='MMD_AT_PLUS_A')
+        solution = self.factorization.solve(np.column_stack((self.rhs.real, self.rhs.imag)))
+        return self.positions(solution[:, 0] + 1j*solution[:, 1])
+
+    def solveIterative(self, initial=None, tol=1e-8, maxiter=None):
+        # initial: positions of all vertices from a previous solve, used as a warm start
+        diagonal = self.Lff.diagonal()
+        preconditioner = sp.diags(1.0/diagonal)
+        x0 = None if initial is None else initial[self.free]
+        self.iterations = 0
+        def count(xk):
+            self.iterations += 1
+        parts = []
+        for rhs, start in [(self.rhs.real, None if x0 is None else x0.real), (self.rhs.imag, None if x0 is None else x0.imag)]:
+            x, info = spla.cg(self.Lff, rhs, x0=start, rtol=tol, maxiter=maxiter, M=preconditioner, callback=count)
+            if info > 0:
+                print('WARNING: TutteEmbedding.solveIterative did not converge in {} iterations'.format(info))
+            parts.append(x)
+        return self.positions(parts[0] + 1j*parts[1])
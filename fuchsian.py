@@ -0,0 +1,96 @@
+import numpy as np
+
+from toolkit import qnorm
+from h2geometry import H2IsometryArray, H2PointArray
+
+
+def euclideanRadii(z, rho):
+    # Euclidean radius of the hyperbolic disk of radius rho centered at z (it is not centered at z)
+    s2 = np.tanh(0.5*rho)**2
+    n = qnorm(z)
+    return (1.0 - n)*np.sqrt(s2)/(1.0 - n*s2)
+
+def hyperbolicRadius(center, z):
+    r = np.abs(z - center)/np.abs(1.0 - np.conj(center)*z)
+    return 2.0*np.arctanh(np.minimum(np.max(r, initial=0.0), 1.0 - 1e-16))
+
+def quantizedKeys(z, quantum):
+    # Points of the disk hashed to int64, |z| < 1 gives |x|, |y| <= 1/quantum < 2**30
+    x = np.rint(z.real/quantum).astype(np.int64)
+    y = np.rint(z.imag/quantum).astype(np.int64)
+    return x*(1 << 31) + y
+
+
+class FuchsianGroup:
+    # Breadth-first enumeration of the reduced words in the generators and their inverses. Group
+    # elements are identified by the quantized image of a base point, so each distinct element is
+    # expanded once. Elements whose image of the base disk is smaller than minPixels are dropped.
+    def __init__(self, generators):
+        generators = H2IsometryArray.fromIsometries(generators)
+        k = len(generators)
+        self.letters = H2IsometryArray(np.concatenate((generators.matrices, generators.inverse().matrices)))
+        self.inverseLetter = np.concatenate((np.arange(k, 2*k), np.arange(k)))
+        self.nbWords, self.nbElements = 0, 0
+
+    def orbit(self, maxLength, basePoint=0.0, radius=1.0, transform=None, pixelScale=None, minPixels=1.0,
+              quantum=1e-9, maxElements=None):
+        # Yields, for each word length, (elements, z, size) where z is the image of basePoint and size
+        # the Euclidean radius of the image of the disk of radius radius around it. The elements are
+        # composed with transform (an H2Isometry) on the left, so the cutoff applies to what is drawn.
+        frontier = H2IsometryArray.identity(1) if transform is None else H2IsometryArray.fromIsometries([transform])
+        lastLetter = np.array([-1])
+        z = frontier.kickEach(H2PointArray(np.array([basePoint], dtype=np.complex128))).z
+        size = euclideanRadii(z, radius)
+        seen = quantizedKeys(z, quantum)
+        self.nbWords, self.nbElements = 1, 1
+        yield frontier, z, size
+        nbLetters = len(self.letters)
+        for length in range(1, maxLength + 1):
+            if len(frontier) == 0:
+                break
+            candidates = H2IsometryArray(np.matmul(frontier.matrices[:, None], self.letters.matrices[None]), frontier.depth + 1)
+            letter = np.tile(np.arange(nbLetters), len(frontier))
+            reduced = letter != np.repeat(self.inverseLetter[lastLetter], nbLetters)
+            reduced |= np.repeat(lastLetter, nbLetters) < 0
+            candidates, letter = candidates[reduced], letter[reduced]
+            self.nbWords += len(candidates)
+            z = candidates.kickEach(H2PointArray(np.full(len(candidates), basePoint, dtype=np.complex128))).z
+            size = euclideanRadii(z, radius)
+            keep = np.ones(len(candidates), dtype=bool) if pixelScale is None else size*pixelScale >= 0.5*minPixels
+            keys = quantizedKeys(z, quantum)
+            _, first = np.unique(keys, return_index=True)
+            unique = np.zeros(len(candidates), dtype=bool)
+            unique[first] = True
+            position = np.minimum(np.searchsorted(seen, keys), seen.shape[0] - 1)
+            keep &= unique & (seen[position] != keys)
+            if maxElements is not None:
+                keep &= np.cumsum(keep) <= maxElements - self.nbElements
+            kept = np.flatnonzero(keep)
+            frontier, lastLetter = candidates[kept], letter[kept]
+            if frontier.depth >= H2IsometryArray.renormalizeEvery:
+                frontier.renormalize()
+            seen = np.union1d(seen, keys[kept])
+            self.nbElements += kept.shape[0]
+            yield frontier, z[kept], size[kept]
+
+    def orbitGraph(self, vertices, edges, maxLength, transform=None, pixelScale=None, minPixels=1.0, rect=None,
+                   batchSize=4096, **kwargs):
+        # Streams the images of a base graph as (vertices, edges) batches, edges indexing into the batch.
+        # rect = (xMin, yMin, xMax, yMax) skips the copies whose image misses it; they are still expanded.
+        vertices = H2PointArray(vertices.z if isinstance(vertices, H2PointArray) else vertices)
+        basePoint = np.mean(vertices.z) if len(vertices) > 0 else 0.0
+        radius = hyperbolicRadius(basePoint, vertices.z)
+        n = len(vertices)
+        for elements, z, size in self.orbit(maxLength, basePoint, radius, transform, pixelScale, minPixels, **kwargs):
+            if rect is not None:
+                xMin, yMin, xMax, yMax = rect
+                # The image disk contains z and has Euclidean radius size, so its center is within size of z
+                visible = ((z.real + 2*size >= xMin) & (z.real - 2*size <= xMax)
+                           & (z.imag + 2*size >= yMin) & (z.imag - 2*size <= yMax))
+                elements = elements[np.flatnonzero(visible)]
+            for start in range(0, len(elements), batchSize):
+                batch = elements[start:start + batchSize]
+                images = batch.kickMany(vertices).reshape(-1)
+                offsets = n*np.arange(len(batch))
+                batchEdges = (edges[None, :, :] + offsets[:, None, None]).reshape(-1, 2)
+                yield images, batchEdges
@@ -0,0 +1,50 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+class Graph:
+    def __init__(self, nbVertices, edges, weights=None):
+        self.nbVertices = nbVertices
+        self.edges = np.ascontiguousarray(edges, dtype=np.int64).reshape(-1, 2)
+        if weights is None:
+            weights = np.ones(self.edges.shape[0])
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.boundary = np.zeros(0, dtype=np.int64)
+        self.boundaryPositions = np.zeros(0, dtype=np.complex128)
+        self.outerCycle = None
+        self.csr = None
+
+    def nbEdges(self):
+        return self.edges.shape[0]
+
+    def setBoundary(self, vertices, positions):
+        self.boundary = np.ascontiguousarray(vertices, dtype=np.int64)
+        self.boundaryPositions = np.ascontiguousarray(positions, dtype=np.complex128)
+
+    def adjacency(self):
+        # Symmetric weighted adjacency in CSR form (indptr, indices, data), parallel edges are summed
+        if self.csr is None:
+            i, j = self.edges[:, 0], self.edges[:, 1]
+            n = self.nbVertices
+            A = sp.coo_matrix((np.concatenate((self.weights, self.weights)), (np.concatenate((i, j)), np.concatenate((j, i)))), shape=(n, n)).tocsr()
+            A.sum_duplicates()
+            self.csr = A.indptr, A.indices, A.data
+        return self.csr
+
+    def adjacencyMatrix(self):
+        indptr, indices, data = self.adjacency()
+        return sp.csr_matrix((data, indices, indptr), shape=(self.nbVertices, self.nbVertices))
+
+    def laplacian(self):
+        A = self.adjacencyMatrix()
+        degrees = np.asarray(A.sum(axis=1)).ravel()
+        return (sp.diags(degrees) - A).tocsr()
+
+    @classmethod
+    def grid(cls, m, n):
+        idx = np.arange(m*n).reshape(m, n)
+        horizontal = np.column_stack((idx[:, :-1].ravel(), idx[:, 1:].ravel()))
+        vertical = np.column_stack((idx[:-1, :].ravel(), idx[1:, :].ravel()))
+        graph = cls(m*n, np.concatenate((horizontal, vertical)))
+        graph.outerCycle = np.concatenate((idx[0, :-1], idx[:-1, -1], idx[-1, :0:-1], idx[:0:-1, 0]))
+        return graph
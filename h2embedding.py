@@ -0,0 +1,144 @@
+import time
+import numpy as np
+
+from toolkit import qnorm
+from embedding import TutteEmbedding
+
+
+def mobius(u, a, z):
+    return u*((z - a)/(1.0 - np.conj(a)*z))
+
+def logMap(z, w):
+    # Tangent vector at z (in disk coordinates) pointing to w, whose hyperbolic length is d(z, w)
+    w0 = (w - z)/(1.0 - np.conj(z)*w)
+    r = np.abs(w0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v0 = np.where(r > 0, np.arctanh(np.minimum(r, 1.0 - 1e-16))*w0/r, 0.0)
+    return (1.0 - qnorm(z))*v0
+
+def expMap(z, v):
+    v0 = v/(1.0 - qnorm(z))
+    r = np.abs(v0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w0 = np.where(r > 0, np.tanh(r)*v0/r, 0.0)
+    return (w0 + z)/(1.0 + np.conj(z)*w0)
+
+def distances(z, w):
+    r = np.abs(z - w)/np.abs(1.0 - np.conj(w)*z)
+    return 2.0*np.arctanh(np.minimum(r, 1.0 - 1e-16))
+
+
+class H2HarmonicEmbedding:
+    # Minimizes the energy sum_e w_e d(x_i, g_e x_j)^2 over the positions of the free vertices.
+    # generators is a list of H2Isometry and edgeGenerators gives, for each edge (i, j), the index
+    # of the isometry g_e applied to x_j, or -1 for the identity. Each iteration moves every free
+    # vertex along the geodesic towards the weighted tangent barycenter of its neighbours, with a
+    # backtracking line search on the step shared by all vertices.
+    def __init__(self, graph, generators=None, edgeGenerators=None):
+        self.graph = graph
+        n, m = graph.nbVertices, graph.nbEdges()
+        self.tails, self.heads = graph.edges[:, 0], graph.edges[:, 1]
+        self.weights = graph.weights
+        generators = [] if generators is None else generators
+        edgeGenerators = -np.ones(m, dtype=np.int64) if edgeGenerators is None else np.asarray(edgeGenerators)
+        us = np.array([1.0] + [g.u for g in generators], dtype=np.complex128)
+        As = np.array([0.0] + [g.a for g in generators], dtype=np.complex128)
+        inverses = [g.inverse() for g in generators]
+        uInv = np.array([1.0] + [g.u for g in inverses], dtype=np.complex128)
+        aInv = np.array([0.0] + [g.a for g in inverses], dtype=np.complex128)
+        self.u, self.a = us[edgeGenerators + 1], As[edgeGenerators + 1]
+        self.uInv, self.aInv = uInv[edgeGenerators + 1], aInv[edgeGenerators + 1]
+        self.twisted = np.flatnonzero(edgeGenerators >= 0)
+
+        self.free = np.ones(n, dtype=bool)
+        self.free[graph.boundary] = False
+        self.totalWeights = np.bincount(self.tails, self.weights, n) + np.bincount(self.heads, self.weights, n)
+        self.totalWeights[self.totalWeights == 0] = 1.0
+
+        self.iterations = 0
+        self.energies = []
+        self.gradientNorms = []
+        self.steps = []
+        self.elapsed = 0.0
+        self.converged = False
+        # 'converged' (gradient norm below tol), 'stalled' (the line search found no decrease),
+        # 'stopped' (by the callback) or 'maxIterations'
+        self.status = None
+
+    def initialPositions(self):
+        # The Euclidean Tutte embedding with the same boundary is a good starting point when
+        # there is no twisted edge; it lies in the convex hull of the boundary, hence in the disk
+        if self.graph.boundary.shape[0] > 0 and self.twisted.shape[0] == 0:
+            return TutteEmbedding(self.graph).solveDirect()
+        positions = np.zeros(self.graph.nbVertices, dtype=np.complex128)
+        positions[self.graph.boundary] = self.graph.boundaryPositions
+        return positions
+
+    def energy(self, positions):
+        targets = mobius(self.u, self.a, positions[self.heads])
+        d = distances(positions[self.tails], targets)
+        return np.sum(self.weights*d*d)
+
+    def direction(self, positions):
+        n = self.graph.nbVertices
+        xi, xj = positions[self.tails], positions[self.heads]
+        toHead = self.weights*logMap(xi, mobius(self.u, self.a, xj))
+        toTail = self.weights*logMap(xj, mobius(self.uInv, self.aInv, xi))
+        sumReal = np.bincount(self.tails, toHead.real, n) + np.bincount(self.heads, toTail.real, n)
+        sumImag = np.bincount(self.tails, toHead.imag, n) + np.bincount(self.heads, toTail.imag, n)
+        direction = (sumReal + 1j*sumImag)/self.totalWeights
+        direction[~self.free] = 0.0
+        return direction
+
+    def solve(self, positions=None, maxIterations=1000, tol=1e-10, callback=None):
+        # callback(iteration, positions, solver) is called after every iteration, for instance
+        # canvas.showH2Graph(*solver.displayGraph(positions)); returning True stops the descent
+        start = time.time()
+        positions = self.initialPositions() if positions is None else positions.copy()
+        energy = self.energy(positions)
+        self.energies, self.gradientNorms, self.steps = [energy], [], []
+        self.iterations, self.converged, self.status = 0, False, 'maxIterations'
+        step = 1.0
+        for iteration in range(maxIterations):
+            direction = self.direction(positions)
+            metric = 4.0/(1.0 - qnorm(positions))**2
+            slope = -2.0*np.sum(self.totalWeights*metric*qnorm(direction))
+            gradientNorm = np.sqrt(-slope)
+            self.gradientNorms.append(gradientNorm)
+            if gradientNorm < tol:
+                self.converged, self.status = True, 'converged'
+                break
+            step = min(1.0, 2.0*step)
+            candidate = expMap(positions, step*direction)
+            candidateEnergy = self.energy(candidate)
+            while candidateEnergy > energy + 1e-4*step*slope and step > 1e-12:
+                step *= 0.5
+                candidate = expMap(positions, step*direction)
+                candidateEnergy = self.energy(candidate)
+            if candidateEnergy >= energy:
+                self.status = 'stalled'
+                break
+            positions, energy = candidate, candidateEnergy
+            self.energies.append(energy)
+            self.steps.append(step)
+            self.iterations = iteration + 1
+            if callback is not None and callback(self.iterations, positions, self):
+                self.status = 'stopped'
+                break
+        self.elapsed = time.time() - start
+        return positions
+
+    def stats(self):
+        return {'iterations': self.iterations, 'energy': self.energies[-1] if self.energies else None,
+                'gradientNorm': self.gradientNorms[-1] if self.gradientNorms else None,
+                'step': self.steps[-1] if self.steps else None, 'converged': self.converged, 'status': self.status, 'elapsed': self.elapsed}
+
+    def displayGraph(self, positions):
+        # Vertices and edges to draw: each twisted edge (i, j, g) gets a copy of g x_j as endpoint
+        n = self.graph.nbVertices
+        twisted = self.twisted
+        copies = mobius(self.u[twisted], self.a[twisted], positions[self.heads[twisted]])
+        vertices = np.concatenate((positions, copies))
+        edges = self.graph.edges.copy()
+        edges[twisted, 1] = n + np.arange(twisted.shape[0])
+        return vertices, edges
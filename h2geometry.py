@@ -6,6 +6,28 @@ class H2Point:
     def __init__(self, z):
         self.z = z
 
+class H2PointArray:
+    def __init__(self, z=None, size=0):
+        if z is None:
+            self.z = np.zeros(size, dtype=np.complex128)
+        else:
+            self.z = np.ascontiguousarray(z, dtype=np.complex128)
+
+    @classmethod
+    def fromPoints(cls, points):
+        return cls(np.fromiter((p.z for p in points), dtype=np.complex128, count=len(points)))
+
+    def __len__(self):
+        return self.z.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return H2Point(self.z[i])
+        return H2PointArray(self.z[i])
+
+    def __iter__(self):
+        return (H2Point(z) for z in self.z)
+
 class H2Segment:
     def __init__(self, p1, p2):
         self.p1 = p1
@@ -26,14 +48,48 @@ class H2Segment:
 
         return straight, c, r, z1, z2
 
+class H2SegmentArray:
+    def __init__(self, p1, p2):
+        self.p1 = p1
+        self.p2 = p2
+
+    def __len__(self):
+        return len(self.p1)
+
+    def getCirclesAndEndpoints(self):
+        z1, z2 = self.p1.z, self.p2.z
+        im = (np.conj(z1)*z2).imag
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = (z2*(1.0+qnorm(z1)) - z1*(1.0+qnorm(z2)))/(2.0*1j*im)
+            r2 = qnorm(c) - 1
+        straight = (im == 0.0) | np.isnan(r2) | (r2 <= 0)
+        r = np.sqrt(np.where(straight, 1.0, r2))
+        c[straight], r[straight] = -1, -1
+        return straight, c, r, z1, z2
+
 
 class H2Isometry:
+    # Products are renormalized once this many compositions have accumulated since the last one
+    renormalizeEvery = 64
+
     def __init__(self, u=1.0, a=0.0):
         self.u = u
         self.a = a
+        self.depth = 0
         if qnorm(a)>1 or abs(qnorm(u)-1)>0.001 :
             print("WARNING: Isometry not well-defined")
 
+    @classmethod
+    def fromMatrix(cls, M):
+        alpha, beta = M[0, 0], M[0, 1]
+        return cls(alpha/np.conj(alpha), -beta/alpha)
+
+    def matrix(self):
+        # SU(1,1) matrix [[alpha, beta], [conj(beta), conj(alpha)]] acting by z -> (alpha*z + beta)/(conj(beta)*z + conj(alpha))
+        s = np.sqrt(np.complex128(self.u))/np.sqrt(1.0 - qnorm(self.a))
+        alpha, beta = s, -s*self.a
+        return np.array([[alpha, beta], [np.conj(beta), np.conj(alpha)]], dtype=np.complex128)
+
     def reset(self):
         self.u = 1.0
         self.a = 0.0
@@ -48,17 +104,109 @@ class H2Isometry:
         temp = 1.0 + self.a*np.conj(other.u*other.a)
         u = self.u*other.u*(temp*temp)/qnorm(temp)
         a = (other.a + (self.a*np.conj(other.u)))/temp
-        return H2Isometry(u,a)
+        depth = max(self.depth, other.depth) + 1
+        if depth >= H2Isometry.renormalizeEvery:
+            u, depth = u/np.abs(u), 0
+        product = H2Isometry(u,a)
+        product.depth = depth
+        return product
 
     def kick(self, p):
         zIn = p.z
         zOut = self.u*((zIn-self.a)/(1.0 - (np.conj(self.a)*zIn)))
         return H2Point(zOut)
 
+    def kickMany(self, points, out=None):
+        # out may be points itself, the denominator is computed before zIn is overwritten
+        zIn = points.z
+        if out is None:
+            out = H2PointArray(size=len(points))
+        den = np.multiply(-np.conj(self.a), zIn)
+        den += 1.0
+        np.subtract(zIn, self.a, out=out.z)
+        out.z /= den
+        out.z *= self.u
+        return out
+
     def kickSegment(self, s):
         return H2Segment(self.kick(s.p1), self.kick(s.p2))
 
+    def kickSegments(self, s):
+        return H2SegmentArray(self.kickMany(s.p1), self.kickMany(s.p2))
+
     def inverse(self):
         u = np.conj(self.u)
         a = -self.u*self.a
-        return H2Isometry(u, a)
\ No newline at end of file
+        return H2Isometry(u, a)
+
+class H2IsometryArray:
+    # Stack of SU(1,1) matrices, see H2Isometry.matrix. Products are renormalized to SU(1,1)
+    # once renormalizeEvery compositions have accumulated, so long products do not drift.
+    renormalizeEvery = 16
+
+    def __init__(self, matrices, depth=0):
+        self.matrices = np.ascontiguousarray(matrices, dtype=np.complex128).reshape(-1, 2, 2)
+        self.depth = depth
+
+    @classmethod
+    def identity(cls, n=1):
+        return cls(np.broadcast_to(np.eye(2, dtype=np.complex128), (n, 2, 2)))
+
+    @classmethod
+    def fromUA(cls, u, a):
+        u, a = np.broadcast_arrays(np.asarray(u, dtype=np.complex128), np.asarray(a, dtype=np.complex128))
+        s = np.sqrt(u)/np.sqrt(1.0 - qnorm(a))
+        alpha, beta = s, -s*a
+        return cls(np.stack((np.stack((alpha, beta), axis=-1), np.stack((np.conj(beta), np.conj(alpha)), axis=-1)), axis=-2))
+
+    @classmethod
+    def fromIsometries(cls, isometries):
+        return cls.fromUA([f.u for f in isometries], [f.a for f in isometries])
+
+    def toUA(self):
+        alpha, beta = self.matrices[:, 0, 0], self.matrices[:, 0, 1]
+        return alpha/np.conj(alpha), -beta/alpha
+
+    def toIsometries(self):
+        return [H2Isometry(u, a) for u, a in zip(*self.toUA())]
+
+    def __len__(self):
+        return self.matrices.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return H2Isometry.fromMatrix(self.matrices[i])
+        return H2IsometryArray(self.matrices[i], self.depth)
+
+    def __mul__(self, other):
+        # Elementwise composition (self[k] applied after other[k]), a stack of length 1 is broadcast
+        product = H2IsometryArray(np.matmul(self.matrices, other.matrices), max(self.depth, other.depth) + 1)
+        if product.depth >= H2IsometryArray.renormalizeEvery:
+            product.renormalize()
+        return product
+
+    def inverse(self):
+        M = self.matrices
+        inverse = np.empty_like(M)
+        inverse[:, 0, 0], inverse[:, 1, 1] = M[:, 1, 1], M[:, 0, 0]
+        inverse[:, 0, 1], inverse[:, 1, 0] = -M[:, 0, 1], -M[:, 1, 0]
+        return H2IsometryArray(inverse, self.depth)
+
+    def renormalize(self):
+        M = self.matrices
+        alpha = 0.5*(M[:, 0, 0] + np.conj(M[:, 1, 1]))
+        beta = 0.5*(M[:, 0, 1] + np.conj(M[:, 1, 0]))
+        s = np.sqrt(qnorm(alpha) - qnorm(beta))
+        alpha, beta = alpha/s, beta/s
+        M[:, 0, 0], M[:, 0, 1], M[:, 1, 0], M[:, 1, 1] = alpha, beta, np.conj(beta), np.conj(alpha)
+        self.depth = 0
+
+    def kickEach(self, points):
+        # The k-th isometry applied to the k-th point
+        M, z = self.matrices, points.z
+        return H2PointArray((M[:, 0, 0]*z + M[:, 0, 1])/(M[:, 1, 0]*z + M[:, 1, 1]))
+
+    def kickMany(self, points):
+        # Every isometry applied to every point, as a (len(self), len(points)) array of positions
+        M, z = self.matrices, points.z[None, :]
+        return (M[:, 0, 0, None]*z + M[:, 0, 1, None])/(M[:, 1, 0, None]*z + M[:, 1, 1, None])
@@ -0,0 +1,31 @@
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage
+
+
+class Layer:
+    # Transparent image that is re-rasterized only when its key changes
+    def __init__(self, paint):
+        self.paint = paint
+        self.key = None
+        self.image = None
+
+    def invalidate(self):
+        self.key = None
+
+    def adopt(self, image, key):
+        # An image rasterized elsewhere, e.g. by progressive refinement, becomes the cached one for key
+        self.image, self.key = image, key
+
+    def update(self, renderer, key):
+        size = (renderer.sizeX, renderer.sizeY)
+        if self.image is None or (self.image.width(), self.image.height()) != size:
+            self.image = QImage(renderer.sizeX, renderer.sizeY, QImage.Format_ARGB32_Premultiplied)
+            self.key = None
+        if key != self.key:
+            self.image.fill(Qt.transparent)
+            renderer.begin(self.image)
+            self.paint()
+            renderer.flush()
+            renderer.end()
+            self.key = key
+        return self.image
@@ -0,0 +1,115 @@
+import collections, json, threading, time
+
+
+class NullStage:
+    # Returned while the profiler is disabled, so that instrumented code only pays for a method call
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+nullStage = NullStage()
+
+
+class Stage:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler, self.name = profiler, name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Frame(Stage):
+    # Outermost stage of a thread: stage times and counters recorded inside it are collected into one frame
+    __slots__ = ()
+
+    def __enter__(self):
+        local = self.profiler.local
+        if getattr(local, 'frame', None) is None:
+            local.frame = {'name': self.name, 'stages': collections.Counter(), 'counters': collections.Counter()}
+            local.owner = self
+        return Stage.__enter__(self)
+
+    def __exit__(self, *args):
+        Stage.__exit__(self, *args)
+        local = self.profiler.local
+        if local.owner is self:
+            frame, local.frame, local.owner = local.frame, None, None
+            frame['time'], frame['end'] = frame['stages'][self.name], self.profiler.timestamp(time.perf_counter())
+            self.profiler.frames.append(frame)
+        return False
+
+
+class Profiler:
+    # Per-thread frame timers and counters, plus Chrome trace events (chrome://tracing, Perfetto)
+    def __init__(self, history=120, maxEvents=1000000):
+        self.enabled = False
+        self.frames = collections.deque(maxlen=history)
+        self.events = collections.deque(maxlen=maxEvents)
+        self.totals = collections.Counter()
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+
+    def timestamp(self, t):
+        return 1e6*(t - self.origin)
+
+    def frame(self, name='frame'):
+        return Frame(self, name) if self.enabled else nullStage
+
+    def stage(self, name):
+        return Stage(self, name) if self.enabled else nullStage
+
+    def record(self, name, start, end):
+        frame = getattr(self.local, 'frame', None)
+        if frame is not None:
+            frame['stages'][name] += end - start
+        self.events.append({'name': name, 'ph': 'X', 'ts': self.timestamp(start), 'dur': 1e6*(end - start),
+                            'pid': 0, 'tid': threading.get_ident()})
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        n = int(n)
+        self.totals[name] += n
+        frame = getattr(self.local, 'frame', None)
+        if frame is not None:
+            frame['counters'][name] += n
+
+    def clear(self):
+        self.frames.clear()
+        self.events.clear()
+        self.totals.clear()
+
+    def lastFrames(self):
+        # The most recent frame of each name
+        frames = {}
+        for frame in self.frames:
+            frames[frame['name']] = frame
+        return frames
+
+    def summary(self, countersPerLine=4):
+        lines = []
+        for name, frame in sorted(self.lastFrames().items()):
+            stages = ' '.join('{} {:.1f}'.format(stage, 1e3*t) for stage, t in frame['stages'].items() if stage != name)
+            lines.append('{} {:.1f} ms  {}'.format(name, 1e3*frame['time'], stages))
+            counters = ['{} {}'.format(k, v) for k, v in sorted(frame['counters'].items()) if v]
+            for k in range(0, len(counters), countersPerLine):
+                lines.append('  ' + ' '.join(counters[k:k + countersPerLine]))
+        return lines
+
+    def exportTrace(self, path):
+        events = list(self.events)
+        for frame in list(self.frames):
+            if frame['counters']:
+                events.append({'name': frame['name'] + ' counters', 'ph': 'C', 'ts': frame['end'], 'pid': 0,
+                               'args': dict(frame['counters'])})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
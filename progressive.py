@@ -0,0 +1,83 @@
+import time
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage
+
+
+class ProgressiveRenderer:
+    # Hyperbolic layer under a per-frame time budget. While the transform is being dragged, coarse()
+    # draws as many of the edges largest on screen as fit in the budget, as chords. Once the interaction
+    # pauses, refine() is called on idle frames and redraws the layer with arcs and every edge, a budget
+    # worth of edges at a time. Both are keyed like Layer, a new key cancels the refinement in progress.
+    def __init__(self, renderer, budget=1/60.0):
+        self.renderer = renderer
+        self.budget = budget
+        self.minEdges = 1000
+        # Drawing rates in edges per second, measured on the previous frames
+        self.coarseRate, self.refineRate = 2e5, 5e4
+        self.coarseKey, self.coarseImage, self.coarseEdges = None, None, 0
+        self.refineKey, self.refineImage, self.refineSteps, self.refined = None, None, None, (0, 0)
+        self.complete = False
+
+    def newImage(self):
+        image = QImage(self.renderer.sizeX, self.renderer.sizeY, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        return image
+
+    def coarse(self, scene, key):
+        if key != self.coarseKey:
+            renderer = self.renderer
+            image = self.newImage()
+            start = time.perf_counter()
+            with renderer.profiler.stage('coarse'):
+                renderer.begin(image)
+                edges = renderer.playgroundHyperbolicCoarse(scene, max(int(self.coarseRate*self.budget), self.minEdges))
+                renderer.flush()
+                renderer.end()
+            elapsed = time.perf_counter() - start
+            if edges > 0 and elapsed > 0:
+                self.coarseRate = 0.5*self.coarseRate + 0.5*edges/elapsed
+            self.coarseKey, self.coarseImage, self.coarseEdges = key, image, edges
+        return self.coarseImage
+
+    def cancel(self):
+        self.refineKey, self.refineImage, self.refineSteps, self.refined = None, None, None, (0, 0)
+        self.complete = False
+
+    def refine(self, scene, key):
+        # One idle frame of refinement, returns True once the frame for key is complete
+        renderer = self.renderer
+        if key != self.refineKey:
+            self.cancel()
+            self.refineKey, self.refineImage = key, self.newImage()
+            self.refineSteps = renderer.refineH2Graph(scene)
+        if self.complete:
+            return True
+        start = time.perf_counter()
+        with renderer.profiler.stage('refine'):
+            renderer.begin(self.refineImage)
+            if self.refined == (0, 0):
+                # Indexing the scene is the first step, it cannot be split
+                self.refined = next(self.refineSteps)
+            while self.refined[0] < self.refined[1]:
+                left = self.budget - (time.perf_counter() - start)
+                if left <= 0:
+                    break
+                stepStart, before = time.perf_counter(), self.refined[0]
+                self.refined = self.refineSteps.send(max(int(self.refineRate*left), self.minEdges))
+                renderer.flush()
+                elapsed = time.perf_counter() - stepStart
+                if elapsed > 0:
+                    self.refineRate = 0.5*self.refineRate + 0.5*(self.refined[0] - before)/elapsed
+            if self.refined[0] >= self.refined[1]:
+                renderer.drawH2pointsClicked(scene)
+                renderer.flush()
+                self.complete = True
+            renderer.end()
+        return self.complete
+
+    def image(self, scene, key):
+        # The refined frame once it has at least the edges of the coarse one, the coarse frame until then
+        if key == self.refineKey and (self.complete or self.refined[0] >= self.coarseEdges):
+            return self.refineImage
+        return self.coarse(scene, key)
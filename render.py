@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse, os, sys
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtGui import QGuiApplication, QImage
+
+from renderer import Renderer
+from scene import Scene
+from tiledexport import renderTiled
+from vectorexport import vectorWriter
+
+
+def makeRenderer(scene, sizeX, sizeY):
+    renderer = Renderer(sizeX, sizeY)
+    renderer.transform = scene.transform
+    if scene.window is not None:
+        renderer.setWindow(*scene.window)
+    else:
+        scale = min(sizeX, sizeY)/2.2
+        renderer.setWindow(-sizeX/(2*scale), sizeY/(2*scale), sizeX/scale, sizeY/scale)
+    return renderer
+
+def renderScene(scene, path, sizeX, sizeY, tileSize=None, processes=None):
+    # With tileSize, raster output is rendered tile by tile in processes workers
+    renderer = makeRenderer(scene, sizeX, sizeY)
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.svg', '.pdf'):
+        renderer.renderVector(vectorWriter(path, sizeX, sizeY), scene)
+    elif tileSize is not None:
+        if extension != '.png':
+            raise ValueError('Tiled export only writes .png files')
+        renderTiled(scene, renderer.viewKey(), path, tileSize, processes)
+    else:
+        image = QImage(sizeX, sizeY, QImage.Format_RGB32)
+        renderer.render(image, scene)
+        if not image.save(path):
+            raise IOError('Could not write {}'.format(path))
+
+def main():
+    parser = argparse.ArgumentParser(description='Render a GraphRep scene file without opening a window')
+    parser.add_argument('scene', help='scene file (.npz)')
+    parser.add_argument('output', help='output image (.png, .svg or .pdf)')
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=800)
+    parser.add_argument('--tile-size', type=int, default=None, help='render a .png in tiles of this size')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes for tiles (default: one per core)')
+    args = parser.parse_args()
+
+    app = QGuiApplication(sys.argv)
+    renderScene(Scene.load(args.scene), args.output, args.width, args.height, args.tile_size, args.processes)
+
+if __name__ == '__main__':
+    main()
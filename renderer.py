@@ -0,0 +1,713 @@
+import numpy as np
+
+from PySide6.QtGui import QColor, QImage, QPainter, QPen
+
+from toolkit import qnorm, mod2pi, mod2piArray, liesOnSmallerArcArray
+from h2geometry import H2Isometry, H2Point, H2PointArray, H2Segment, H2SegmentArray
+from drawlist import DrawList
+from spatialindex import H2SceneIndex
+from profiler import Profiler
+
+
+class Renderer:
+
+    def __init__(self, sizeX=800, sizeY=800):
+        self.painter = QPainter()
+        self.drawList = DrawList()
+        self.sceneIndex, self.sceneIndexKey = H2SceneIndex.empty(), None
+        self.clickedGeometry, self.clickedKey = None, None
+        self.edgeStylesCache, self.edgeStylesKey = None, None
+        # Off-screen renderers that draw many frames of one scene (animation) neither pick nor share
+        # their index with another thread: the grids of the index are then built on demand and the
+        # transformed vertices are written into the same buffer every frame
+        self.pickingIndex = True
+        self.reuseBuffers = False
+        self.vertexBuffer = None
+        self.device = None
+        self.transformVersion = 0
+        # Edges whose on-screen extent is below lodPixels are drawn as one point per pixel ('points')
+        # or accumulated into a translucent coverage raster ('density'), without computing their arcs
+        self.lodPixels = 1.0
+        self.lodMode = 'points'
+        # Pixel coordinates and arc angles are rounded for raster output, not for vector export
+        self.pixelRounding = True
+        self.vectorWriter = None
+        # Edges drawn between two writes to the vector writer, which bounds the geometry held by the draw list
+        self.vectorBatch = 50000
+        self.profiler = Profiler()
+        self.resetView(sizeX, sizeY)
+
+    # Disk space geometry is cached against transformVersion, so self.transform must be
+    # reassigned, not mutated in place, for the caches to notice a new isometry
+    @property
+    def transform(self):
+        return self.currentTransform
+
+    @transform.setter
+    def transform(self, transform):
+        self.currentTransform = transform
+        self.transformVersion += 1
+
+    def resetView(self, sizeX, sizeY):
+        self.xMin, self.yMax= -1.1, 1.1
+        self.sizeX, self.sizeY = sizeX, sizeY
+        self.scaleX, self.scaleY = sizeX/2.2, sizeY/2.2
+        self.transform = H2Isometry(1.0, 0.0)
+
+    def xMax(self):
+        return self.xMin + self.sizeX/self.scaleX
+
+    def yMin(self):
+        return self.yMax - self.sizeY/self.scaleY
+
+    def isInside(self, z):
+        x, y = z.real, z.imag
+        return (x >= self.xMin) and (x <= self.xMax()) and (y >= self.yMin()) and (y <= self.yMax)
+
+    def complexToPixel(self, z):
+        x, y = z.real, z.imag
+        xOut = (x - self.xMin)*self.scaleX
+        yOut = (self.yMax - y)*self.scaleY
+        if self.pixelRounding:
+            return np.rint(xOut), np.rint(yOut)
+        return xOut, yOut
+
+    def pixelToComplex(self, x, y):
+        a = self.xMin + (x/self.scaleX)
+        b = self.yMax - (y/self.scaleY)
+        return a+b*1j
+
+    def zoom(self, coeff, centerX=-1, centerY=-1):
+        if centerX==-1 and centerY==-1:
+            centerX = np.rint(self.sizeX/2.0)
+            centerY = np.rint(self.sizeX/2.0)
+        x, y = self.xMin + centerX/self.scaleX, self.yMax - centerY/self.scaleY
+        self.xMin = x - (x - self.xMin)/coeff
+        self.yMax = y + (self.yMax - y)/coeff
+        self.scaleX, self.scaleY = coeff*self.scaleX, coeff*self.scaleY
+
+    def shift(self, x, y):
+        self.xMin += x/self.scaleX
+        self.yMax += y/self.scaleY
+
+    def rescale(self, sizeX, sizeY):
+        xFactor, yFactor = sizeX*1.0/self.sizeX, sizeY*1.0/self.sizeY
+        self.sizeX, self.sizeY = sizeX, sizeY
+        self.scaleX, self.scaleY = xFactor * self.scaleX, yFactor * self.scaleY
+
+    def viewKey(self):
+        return self.xMin, self.yMax, self.scaleX, self.scaleY, self.sizeX, self.sizeY
+
+    def setView(self, view):
+        self.xMin, self.yMax, self.scaleX, self.scaleY, self.sizeX, self.sizeY = view
+
+    def transformKey(self):
+        return self.transformVersion
+
+    def setWindow(self, xMin, yMax, width, height):
+        self.xMin, self.yMax = xMin, yMax
+        self.scaleX, self.scaleY = self.sizeX/width, self.sizeY/height
+
+    def window(self):
+        return self.xMin, self.yMax, self.sizeX/self.scaleX, self.sizeY/self.scaleY
+
+    def begin(self, device):
+        self.device = device
+        self.painter.begin(device)
+        self.painter.setRenderHint(QPainter.Antialiasing, True)
+        self.painter.setPen(QPen())
+        self.painter.setClipRect(0, 0, self.sizeX, self.sizeY)
+
+    def end(self):
+        self.painter.end()
+        self.device = None
+
+    def redrawback(self):
+        if isinstance(self.device, QImage):
+            self.device.fill('white')
+
+    def render(self, device, scene):
+        with self.profiler.frame('render'):
+            self.begin(device)
+            self.redrawback()
+            self.playground(scene)
+            self.flush()
+            self.end()
+
+    def renderVector(self, writer, scene):
+        # Streams the scene to a vectorexport writer instead of a QPaintDevice, vectorBatch edges at a time
+        self.vectorWriter, self.pixelRounding = writer, False
+        try:
+            writer.begin()
+            self.playground(scene)
+            self.flush()
+            writer.end()
+        finally:
+            self.vectorWriter, self.pixelRounding = None, True
+
+    def batches(self, items):
+        # The whole array for raster output. For vector export, slices of vectorBatch items, the draw
+        # list being written out after each of them so that it never holds more than one batch.
+        if self.vectorWriter is None:
+            yield items
+            return
+        for start in range(0, items.shape[0], self.vectorBatch):
+            yield items[start:start + self.vectorBatch]
+            self.flush()
+
+    def flush(self):
+        with self.profiler.stage('rasterize'):
+            if self.vectorWriter is not None:
+                self.drawList.write(self.vectorWriter)
+            else:
+                self.drawList.flush(self.painter)
+
+    def drawPoint(self, z, color=QColor('black'), width=1):
+        x, y = self.complexToPixel(z)
+        self.drawList.addPoints(x, y, color, width)
+
+    def drawSegment(self, z1, z2, color=QColor('black'), width=1):
+        x1, y1 = self.complexToPixel(z1)
+        x2, y2 = self.complexToPixel(z2)
+        self.drawList.addLines(x1, y1, x2, y2, color, width)
+
+    def drawCircle(self, c, r, color = QColor('black'), width=1):
+        firstCorner = c + r*(-1+1j)
+        secondCorner = c + r*(1-1j)
+        x1, y1 = self.complexToPixel(firstCorner)
+        x2, y2 = self.complexToPixel(secondCorner)
+        self.drawList.addEllipses(x1, y1, x2 - x1, y2 - y1, color, width)
+
+    def drawSmallerArc(self, c, r, z1, z2, color, width):
+        outside, straight, z1New, z2New = self.straightApprox(c, r, z1, z2)
+        if outside:
+            pass
+        elif straight:
+            self.drawSegment(z1New, z2New, color, width)
+        else:
+            angle1, angle2 = np.angle(z1 - c), np.angle(z2 - c)
+            if ((z2-c)*np.conj(z1-c)).imag < 0:
+                angle1, angle2 = angle2, angle1
+            corner1, corner2 = c + r*(-1.0+1j), c + r*(1.0-1j)
+            x1, y1 = self.complexToPixel(corner1)
+            x2, y2 = self.complexToPixel(corner2)
+            qtAngle = np.rint(mod2pi(angle1)*16*360/(2*np.pi))
+            qtSpan = np.rint(mod2pi(angle2 - angle1)*16*360/(2*np.pi))
+            #print('c = {:2}, r = {:2}, z1 = {:2}, z2 = {:2}'.format(c, r, z1, z2))
+            #print('x1 = {}, y1 = {}, x2 - x1 = {}, y2 - y1 = {}, qtAngle = {}, qtSpan = {}'.format(x1, y1, x2 - x1, y2 - y1, qtAngle, qtSpan))
+            self.drawList.addArcs(x1, y1, x2 - x1, y2 - y1, qtAngle, qtSpan, color, width)
+
+    def straightApprox(self, c, r, z1, z2):
+        inside, outside, many, z1New, z2New = self.arcIntersectsCanvasBoundary(c, r, z1, z2)
+        straight = False
+        if many:
+            self.profiler.count('clip.many')
+        elif outside:
+            self.profiler.count('clip.outside')
+        elif self.isAlmostSmallStraightArc(c, r, z1, z2):
+            self.profiler.count('clip.smallStraight')
+            z1New, z2New = z1, z2 # I'm tempted to comment this line but it corresponds to what I had
+            straight = True
+        elif self.isAlmostInfiniteRadius(r):
+            self.profiler.count('clip.infiniteRadius')
+            straight = True
+        else:
+            self.profiler.count('clip.arc')
+        return outside, straight, z1New, z2New
+
+    def liesOnSmallerArc(self, z, center, endpoint1, endpoint2):
+        u, u1, u2 = z - center, endpoint1 - center, endpoint2 - center
+        v, v2 = u*np.conj(u1), u2*np.conj(u1)
+        if np.imag(v2) > 0:
+            return (v.imag >= 0) and (v.real >= v2.real)
+        else:
+            return (v.imag <= 0) and (v.real >= v2.real)
+
+    def isAlmostInfiniteRadius(self, r):
+        angleMin = np.pi/(180*16)
+        scale = max(self.scaleX, self.scaleY)
+        pxError = 8.0
+        return np.isnan(r) or (r*scale*angleMin > pxError)
+
+    def isAlmostSmallStraightArc(self, c, r, z1, z2):
+        z2New = (z2 - c)*np.conj(z1 - c)/(r*r)
+        X2, Y2 = z2New.real, z2New.imag
+        mX, mY = 0.5*(1.0 + X2), 0.5*(1.0 - X2)
+        if np.isnan(mX) or np.isnan(mY) or mX<=0 or mY<=0:
+            return True
+        else:
+            arcMidX, arcMidY = np.sqrt(mX), np.sqrt(mY)
+            arcMidY = arcMidY if (Y2 > 0) else -arcMidY
+            arcMid = arcMidX + arcMidY*1j
+            lineMid = 0.5*(1.0 + z2New)
+            scale = max(self.scaleX, self.scaleY)
+            pxDeltaSq = np.rint(qnorm(arcMid - lineMid)*r*r*scale*scale)
+            pxTolSq = 0
+            return pxDeltaSq <= pxTolSq
+
+    def circleIntersectsCanvasBoundary(self, c, r):
+        intersections = []
+        xMin, xMax, yMin, yMax = self.xMin, self.xMax(), self.yMin(), self.yMax
+        xc, yc = c.real, c.imag
+        for x in [xMin, xMax]:
+            D = r*r - (x-xc)*(x-xc)
+            if D >= 0:
+                D = np.sqrt(D)
+                for y in [yc+D, yc-D]:
+                    if (y >= yMin) and (y <= yMax):
+                        intersections.append(x+y*1j)
+        for y in [yMin, yMax]:
+            D = r*r - (y-yc)*(y-yc)
+            if D >= 0:
+                D = np.sqrt(D)
+                for x in [xc+D, xc-D]:
+                    if (x >= xMin) and (x <= xMax):
+                        intersections.append(x+y*1j)
+        return intersections
+
+    def arcIntersectsCanvasBoundary(self, c, r, z1, z2):
+        inside, outside, many = False, False, False
+        z1New, z2New = z1, z2
+        isIn1, isIn2 = self.isInside(z1), self.isInside(z2)
+        if isIn1 and isIn2:
+            inside = True
+        else:
+            intersections = self.circleIntersectsCanvasBoundary(c, r)
+            nbInter = len(intersections)
+            if (nbInter == 0):
+                if (not isIn1) and (not isIn2):
+                    outside = True
+                else:
+                    self.profiler.count('clip.problem')
+            elif (nbInter == 2):
+                inter1, inter2 = intersections[0], intersections[1]
+                if isIn1 and (not isIn2):
+                    if self.liesOnSmallerArc(inter1, c, z1, z2):
+                        z2New = inter1
+                    elif self.liesOnSmallerArc(inter2, c, z1, z2):
+                        z2New = inter2
+                    else:
+                        self.profiler.count('clip.problem')
+                elif isIn2 and (not isIn1):
+                    if self.liesOnSmallerArc(inter1, c, z2, z1):
+                        z1New = inter1
+                    elif self.liesOnSmallerArc(inter2, c, z2, z1):
+                        z1New = inter2
+                    else:
+                        self.profiler.count('clip.problem')
+                else:
+                    if self.liesOnSmallerArc(inter1, c, z1, z2) and self.liesOnSmallerArc(inter2, c, z1, z2):
+                        if self.liesOnSmallerArc(inter1, c, z1, inter2):
+                            z1New, z2New = inter1, inter2
+                        elif self.liesOnSmallerArc(inter2, c, z1, inter1):
+                            z1New, z2New = inter2, inter1
+                        else:
+                            self.profiler.count('clip.problem')
+                    else:
+                        outside = True
+            elif (nbInter % 2) == 1:
+                self.profiler.count('clip.problem')
+            else:
+                # In this case, the full circle has 4 or more intersections with the canvas boundary, which is possible, but implies that it does not look straight
+                many = True
+        return inside, outside, many, z1New, z2New
+
+    def isInsideMany(self, z):
+        x, y = z.real, z.imag
+        return (x >= self.xMin) & (x <= self.xMax()) & (y >= self.yMin()) & (y <= self.yMax)
+
+    def liesOnSmallerArcMany(self, z, center, endpoint1, endpoint2):
+        return liesOnSmallerArcArray(z, center, endpoint1, endpoint2)
+
+    def isAlmostInfiniteRadiusMany(self, r):
+        angleMin = np.pi/(180*16)
+        scale = max(self.scaleX, self.scaleY)
+        pxError = 8.0
+        return np.isnan(r) | (r*scale*angleMin > pxError)
+
+    def isAlmostSmallStraightArcMany(self, c, r, z1, z2):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z2New = (z2 - c)*np.conj(z1 - c)/(r*r)
+            X2, Y2 = z2New.real, z2New.imag
+            mX, mY = 0.5*(1.0 + X2), 0.5*(1.0 - X2)
+            degenerate = np.isnan(mX) | np.isnan(mY) | (mX <= 0) | (mY <= 0)
+            arcMidX, arcMidY = np.sqrt(np.where(degenerate, 0.0, mX)), np.sqrt(np.where(degenerate, 0.0, mY))
+            arcMid = arcMidX + np.where(Y2 > 0, arcMidY, -arcMidY)*1j
+            lineMid = 0.5*(1.0 + z2New)
+            scale = max(self.scaleX, self.scaleY)
+            pxDeltaSq = np.rint(qnorm(arcMid - lineMid)*r*r*scale*scale)
+        pxTolSq = 0
+        return degenerate | (pxDeltaSq <= pxTolSq)
+
+    def circlesIntersectCanvasBoundary(self, c, r):
+        # Candidates are listed in the order circleIntersectsCanvasBoundary appends them
+        xMin, xMax, yMin, yMax = self.xMin, self.xMax(), self.yMin(), self.yMax
+        xc, yc = c.real[:, None], c.imag[:, None]
+        r2 = (r*r)[:, None]
+        with np.errstate(invalid='ignore'):
+            DX = r2 - (np.array([xMin, xMax]) - xc)**2
+            DY = r2 - (np.array([yMin, yMax]) - yc)**2
+            sX, sY = np.sqrt(np.where(DX >= 0, DX, 0.0)), np.sqrt(np.where(DY >= 0, DY, 0.0))
+        n = c.shape[0]
+        candidates = np.empty((n, 8), dtype=np.complex128)
+        valid = np.empty((n, 8), dtype=bool)
+        for k, x in enumerate([xMin, xMax]):
+            for l, sign in enumerate([1.0, -1.0]):
+                y = yc[:, 0] + sign*sX[:, k]
+                candidates[:, 2*k+l] = x + y*1j
+                valid[:, 2*k+l] = (DX[:, k] >= 0) & (y >= yMin) & (y <= yMax)
+        for k, y in enumerate([yMin, yMax]):
+            for l, sign in enumerate([1.0, -1.0]):
+                x = xc[:, 0] + sign*sY[:, k]
+                candidates[:, 4+2*k+l] = x + y*1j
+                valid[:, 4+2*k+l] = (DY[:, k] >= 0) & (x >= xMin) & (x <= xMax)
+        return candidates, valid
+
+    def arcsIntersectCanvasBoundary(self, c, r, z1, z2):
+        n = c.shape[0]
+        z1New, z2New = z1.copy(), z2.copy()
+        isIn1, isIn2 = self.isInsideMany(z1), self.isInsideMany(z2)
+        inside = isIn1 & isIn2
+        candidates, valid = self.circlesIntersectCanvasBoundary(c, r)
+        valid[inside] = False
+        nbInter = valid.sum(axis=1)
+        first = np.argsort(~valid, axis=1, kind='stable')[:, :2]
+        rows = np.arange(n)
+        inter1, inter2 = candidates[rows, first[:, 0]], candidates[rows, first[:, 1]]
+
+        outside = (nbInter == 0) & ~isIn1 & ~isIn2
+        many = (nbInter >= 4) & (nbInter % 2 == 0)
+
+        two = (nbInter == 2)
+        only1 = two & isIn1 & ~isIn2
+        on1, on2 = self.liesOnSmallerArcMany(inter1, c, z1, z2), self.liesOnSmallerArcMany(inter2, c, z1, z2)
+        z2New = np.where(only1 & on1, inter1, np.where(only1 & ~on1 & on2, inter2, z2New))
+        only2 = two & isIn2 & ~isIn1
+        on1R, on2R = self.liesOnSmallerArcMany(inter1, c, z2, z1), self.liesOnSmallerArcMany(inter2, c, z2, z1)
+        z1New = np.where(only2 & on1R, inter1, np.where(only2 & ~on1R & on2R, inter2, z1New))
+        neither = two & ~isIn1 & ~isIn2
+        crossing = neither & on1 & on2
+        order12 = crossing & self.liesOnSmallerArcMany(inter1, c, z1, inter2)
+        order21 = crossing & ~order12 & self.liesOnSmallerArcMany(inter2, c, z1, inter1)
+        z1New = np.where(order12, inter1, np.where(order21, inter2, z1New))
+        z2New = np.where(order12, inter2, np.where(order21, inter1, z2New))
+        outside |= neither & ~crossing
+        if self.profiler.enabled:
+            # Cases arcIntersectsCanvasBoundary reports as problems, kept as they are
+            problems = (((nbInter == 0) & (isIn1 ^ isIn2)) | (nbInter % 2 == 1) | (only1 & ~on1 & ~on2)
+                        | (only2 & ~on1R & ~on2R) | (crossing & ~order12 & ~order21))
+            self.profiler.count('clip.problem', np.count_nonzero(problems))
+        return inside, outside, many, z1New, z2New
+
+    def straightApproxMany(self, c, r, z1, z2):
+        inside, outside, many, z1New, z2New = self.arcsIntersectCanvasBoundary(c, r, z1, z2)
+        candidate = ~many & ~outside
+        smallStraight = candidate & self.isAlmostSmallStraightArcMany(c, r, z1, z2)
+        infiniteRadius = candidate & ~smallStraight & self.isAlmostInfiniteRadiusMany(r)
+        if self.profiler.enabled:
+            self.profiler.count('clip.many', np.count_nonzero(many))
+            self.profiler.count('clip.outside', np.count_nonzero(outside))
+            self.profiler.count('clip.smallStraight', np.count_nonzero(smallStraight))
+            self.profiler.count('clip.infiniteRadius', np.count_nonzero(infiniteRadius))
+            self.profiler.count('clip.arc', np.count_nonzero(candidate & ~smallStraight & ~infiniteRadius))
+        z1New = np.where(smallStraight, z1, z1New)
+        z2New = np.where(smallStraight, z2, z2New)
+        return outside, smallStraight | infiniteRadius, z1New, z2New
+
+    def circlesToPixelRects(self, c, r):
+        x1, y1 = self.complexToPixel(c + r*(-1.0+1j))
+        x2, y2 = self.complexToPixel(c + r*(1.0-1j))
+        return x1, y1, x2 - x1, y2 - y1
+
+    def arcsToQt(self, c, z1, z2):
+        angle1, angle2 = np.angle(z1 - c), np.angle(z2 - c)
+        swap = ((z2 - c)*np.conj(z1 - c)).imag < 0
+        angle1, angle2 = np.where(swap, angle2, angle1), np.where(swap, angle1, angle2)
+        qtAngle = mod2piArray(angle1)*16*360/(2*np.pi)
+        qtSpan = mod2piArray(angle2 - angle1)*16*360/(2*np.pi)
+        if self.pixelRounding:
+            return np.rint(qtAngle), np.rint(qtSpan)
+        return qtAngle, qtSpan
+
+    def prepareH2Segments(self, s):
+        return self.clipH2Circles(*s.getCirclesAndEndpoints())
+
+    def clipH2Circles(self, straight, c, r, z1, z2):
+        with self.profiler.stage('clip'):
+            n = straight.shape[0]
+            visible, straight = np.ones(n, dtype=bool), straight.copy()
+            z1New, z2New = z1.copy(), z2.copy()
+            qtAngle, qtSpan = np.zeros(n), np.zeros(n)
+            arcs = np.flatnonzero(~straight)
+            outside, approx, z1Arc, z2Arc = self.straightApproxMany(c[arcs], r[arcs], z1[arcs], z2[arcs])
+            visible[arcs] = ~outside
+            straight[arcs] = approx
+            z1New[arcs], z2New[arcs] = z1Arc, z2Arc
+            qtAngle[arcs], qtSpan[arcs] = self.arcsToQt(c[arcs], z1[arcs], z2[arcs])
+            return visible, straight, c, r, z1New, z2New, qtAngle, qtSpan
+
+    def pixelToH2(self, x, y):
+        p = H2Point(self.pixelToComplex(x,y))
+        return self.transform.inverse().kick(p)
+
+    def drawH2Point(self, p, color='black', width=1):
+        z = self.transform.kick(p).z
+        self.drawPoint(z, color, width)
+
+
+    def drawH2Segment(self, p1, p2, color='black', width=1):
+        s = H2Segment(p1, p2)
+        self.drawKickedH2Segment(self.transform.kickSegment(s), color, width)
+
+    def drawKickedH2Segment(self, s, color='black', width=1):
+        straight, c, r, z1, z2 = s.getCircleAndEndpoints()
+        if straight:
+            self.drawSegment(z1, z2, color, width)
+        else:
+            self.drawSmallerArc(c, r, z1, z2, color, width)
+
+    def drawH2Segments(self, s, color='black', width=1):
+        self.drawClippedH2Segments(*self.prepareH2Segments(self.transform.kickSegments(s)), color, width)
+
+    def drawClippedH2Segments(self, visible, straight, c, r, z1, z2, qtAngle, qtSpan, color='black', width=1):
+        lines = visible & straight
+        X1, Y1 = self.complexToPixel(z1[lines])
+        X2, Y2 = self.complexToPixel(z2[lines])
+        self.drawList.addLines(X1, Y1, X2, Y2, color, width)
+        arcs = visible & ~straight
+        if self.profiler.enabled:
+            self.profiler.count('drawLine', np.count_nonzero(lines))
+            self.profiler.count('drawArc', np.count_nonzero(arcs))
+        X, Y, W, H = self.circlesToPixelRects(c[arcs], r[arcs])
+        self.drawList.addArcs(X, Y, W, H, qtAngle[arcs], qtSpan[arcs], color, width)
+
+    def pixelExtents(self, z1, z2):
+        # The smaller arc between z1 and z2 stays within its chord's bounding box up to the sagitta,
+        # which is negligible at the sizes this is used for
+        return np.maximum(np.abs(z1.real - z2.real)*self.scaleX, np.abs(z1.imag - z2.imag)*self.scaleY)
+
+    def drawSubPixelEdges(self, z1, z2, color='black', width=1):
+        self.profiler.count('subPixel', z1.shape[0])
+        X, Y = self.complexToPixel(0.5*(z1 + z2))
+        inside = (X >= 0) & (X < self.sizeX) & (Y >= 0) & (Y < self.sizeY)
+        X, Y = X[inside].astype(np.int64), Y[inside].astype(np.int64)
+        if self.lodMode == 'density':
+            self.drawList.addDensity(X, Y, color, width)
+        else:
+            # Many edges land on the same pixel, each pixel is drawn once
+            pixels = np.unique(Y*self.sizeX + X)
+            self.drawList.addPoints(pixels % self.sizeX, pixels // self.sizeX, color, width)
+
+    def drawH2Edges(self, z1, z2, color='black', width=1):
+        # Edges given by their disk space endpoints, the arcs are only computed above lodPixels
+        small = self.pixelExtents(z1, z2) < self.lodPixels
+        self.drawSubPixelEdges(z1[small], z2[small], color, width)
+        large = np.flatnonzero(~small)
+        s = H2SegmentArray(H2PointArray(z1[large]), H2PointArray(z2[large]))
+        self.drawClippedH2Segments(*self.prepareH2Segments(s), color, width)
+
+    def chordsInWindow(self, z1, z2):
+        # Indices of the segments [z1, z2] whose bounding box meets the window
+        xMin, xMax, yMin, yMax = self.xMin, self.xMax(), self.yMin(), self.yMax
+        return np.flatnonzero(~(((z1.real < xMin) & (z2.real < xMin)) | ((z1.real > xMax) & (z2.real > xMax))
+                                | ((z1.imag < yMin) & (z2.imag < yMin)) | ((z1.imag > yMax) & (z2.imag > yMax))))
+
+    def drawGraph(self, scene, color='black', width=1):
+        z1, z2 = scene.vertices[scene.edges[:, 0]], scene.vertices[scene.edges[:, 1]]
+        culled = self.chordsInWindow(z1, z2)
+        for edges in self.batches(culled):
+            X1, Y1 = self.complexToPixel(z1[edges])
+            X2, Y2 = self.complexToPixel(z2[edges])
+            self.drawList.addLines(X1, Y1, X2, Y2, color, width)
+
+    def indexH2Graph(self, scene, lazy=None):
+        # With lazy, the grids of a new index are built by the first query that needs them. The coarse
+        # frames index the scene this way, so that picking matches the transform they show.
+        key = (self.transformVersion, scene, scene.version)
+        if key != self.sceneIndexKey:
+            with self.profiler.stage('transform'):
+                vertices = self.transform.kickMany(scene.H2vertices, self.verticesBuffer(len(scene.H2vertices)))
+            edges = scene.H2edges
+            with self.profiler.stage('index'):
+                # The circles are computed by the index for the edges drawn as arcs only
+                self.sceneIndex = H2SceneIndex(vertices.z, vertices.z[edges[:, 0]], vertices.z[edges[:, 1]], lazy=not self.pickingIndex if lazy is None else lazy)
+            self.sceneIndexKey = key
+        return self.sceneIndex
+
+    def verticesBuffer(self, n):
+        if not self.reuseBuffers:
+            return None
+        if self.vertexBuffer is None or len(self.vertexBuffer) != n:
+            self.vertexBuffer = H2PointArray(size=n)
+        return self.vertexBuffer
+
+    def kickH2pointsClicked(self, scene):
+        key = (self.transformVersion, scene, scene.version)
+        if key != self.clickedKey:
+            H2points = self.transform.kickMany(H2PointArray.fromPoints(scene.H2pointsClicked))
+            circles = H2SegmentArray(H2points[1:], H2points[:-1]).getCirclesAndEndpoints()
+            self.clickedGeometry, self.clickedKey = (H2points.z, circles), key
+        return self.clickedGeometry
+
+    def drawH2Graph(self, scene, color='black', width=1):
+        index = self.indexH2Graph(scene)
+        with self.profiler.stage('cull'):
+            culled = index.edgesInRect(self.xMin, self.yMin(), self.xMax(), self.yMax)
+        self.profiler.count('edges', scene.H2edges.shape[0])
+        self.profiler.count('edgesVisible', culled.shape[0])
+        for edges in self.batches(culled):
+            self.drawStyledH2Edges(scene, edges, lambda edges, c, w: self.drawIndexedH2Edges(index, edges, c, w), color, width)
+
+    def drawStyledH2Edges(self, scene, edges, draw, color='black', width=1):
+        # Edges with a style id are drawn with scene.styles instead of color and width
+        if scene.H2edgeStyles is None:
+            draw(edges, color, width)
+            return
+        styleIds, used = self.edgeStyles(scene)
+        styles = styleIds[edges]
+        for style in used:
+            selected = edges[styles == style]
+            if selected.shape[0] > 0:
+                styleColor, styleWidth = scene.styles[style]
+                draw(selected, styleColor, styleWidth)
+
+    def edgeStyles(self, scene):
+        # Style of every edge and the styles in use, kept while the scene does not change
+        key = (scene, scene.version)
+        if key != self.edgeStylesKey:
+            styles = scene.H2edgeStyles % len(scene.styles)
+            self.edgeStylesCache, self.edgeStylesKey = (styles, np.unique(styles)), key
+        return self.edgeStylesCache
+
+    def prioritizedH2Edges(self, z1, z2):
+        # Edges whose chord meets the window, with their priorities: the on-screen extent, weighted by
+        # 1 - |z|^2 at the midpoint so that edges near the center come before long ones hugging the boundary
+        culled = self.chordsInWindow(z1, z2)
+        return culled, self.edgePriorities(z1[culled], z2[culled])
+
+    def edgePriorities(self, z1, z2):
+        middle = 0.5*(z1 + z2)
+        return self.pixelExtents(z1, z2)*(1.0 - (middle.real**2 + middle.imag**2))
+
+    def drawCoarseH2Graph(self, scene, maxEdges, color='black', width=1):
+        # The maxEdges edges of highest priority as chords, the other visible edges only add their
+        # midpoint to a coverage raster. Returns the number of chords drawn.
+        index = self.indexH2Graph(scene, lazy=True)
+        with self.profiler.stage('prioritize'):
+            culled, priorities = self.prioritizedH2Edges(index.z1, index.z2)
+            rest = culled[:0]
+            if culled.shape[0] > maxEdges:
+                order = np.argpartition(-priorities, maxEdges - 1)
+                culled, rest = culled[order[:maxEdges]], culled[order[maxEdges:]]
+        self.profiler.count('edgesCoarse', culled.shape[0])
+
+        def drawChords(edges, color, width):
+            X1, Y1 = self.complexToPixel(index.z1[edges])
+            X2, Y2 = self.complexToPixel(index.z2[edges])
+            self.drawList.addLines(X1, Y1, X2, Y2, color, width)
+
+        def drawCoverage(edges, color, width):
+            X, Y = self.complexToPixel(0.5*(index.z1[edges] + index.z2[edges]))
+            self.drawList.addDensity(X, Y, color, width)
+
+        self.drawStyledH2Edges(scene, culled, drawChords, color, width)
+        if rest.shape[0] > 0:
+            self.drawStyledH2Edges(scene, rest, drawCoverage, color, width)
+        return culled.shape[0]
+
+    def refineH2Graph(self, scene, prioritized=True, color='black', width=1):
+        # Generator drawing the visible edges with their arcs, by priority unless prioritized is False.
+        # It is sent the number of edges to draw at each step and yields (drawn so far, total); the
+        # caller flushes in between, and may stop at any step.
+        index = self.indexH2Graph(scene)
+        culled = index.edgesInRect(self.xMin, self.yMin(), self.xMax(), self.yMax)
+        self.profiler.count('edges', scene.H2edges.shape[0])
+        self.profiler.count('edgesVisible', culled.shape[0])
+        if prioritized:
+            culled = culled[np.argsort(-self.edgePriorities(index.z1[culled], index.z2[culled]), kind='stable')]
+        done = 0
+        while done < culled.shape[0]:
+            chunk = yield done, culled.shape[0]
+            edges = culled[done:done + max(int(chunk or 0), 1)]
+            self.drawStyledH2Edges(scene, edges, lambda edges, c, w: self.drawIndexedH2Edges(index, edges, c, w), color, width)
+            done += edges.shape[0]
+        yield done, culled.shape[0]
+
+    def drawIndexedH2Edges(self, index, culled, color='black', width=1):
+        small = self.pixelExtents(index.z1[culled], index.z2[culled]) < self.lodPixels
+        self.drawSubPixelEdges(index.z1[culled[small]], index.z2[culled[small]], color, width)
+        straight, c, r, z1, z2 = index.edgeGeometry(culled[~small])
+        self.drawClippedH2Segments(*self.clipH2Circles(straight, c, r, z1, z2), color, width)
+
+    def drawH2Orbit(self, group, vertices, edges, maxLength, color='black', width=1, minPixels=1.0):
+        # Images of a base graph under the words of length <= maxLength in a FuchsianGroup,
+        # drawn batch by batch as they are generated
+        rect = (self.xMin, self.yMin(), self.xMax(), self.yMax)
+        batches = group.orbitGraph(vertices, edges, maxLength, self.transform, max(self.scaleX, self.scaleY), minPixels, rect)
+        for z, batchEdges in batches:
+            for edges in self.batches(batchEdges):
+                self.drawH2Edges(z[edges[:, 0]], z[edges[:, 1]], color, width)
+
+    def drawH2GraphVertex(self, i, color='black', width=1):
+        self.drawPoint(self.sceneIndex.vertices[i], color, width)
+
+    def drawH2GraphEdge(self, i, color='black', width=1):
+        straight, c, r, z1, z2 = self.sceneIndex.edgeGeometry([i])
+        self.drawClippedH2Segments(*self.clipH2Circles(straight, c, r, z1, z2), color, width)
+
+    def drawPick(self, pick, color='black', width=1):
+        kind, i = pick
+        if kind == 'vertex':
+            self.drawH2GraphVertex(i, color, width + 2)
+        else:
+            self.drawH2GraphEdge(i, color, width)
+
+    def pickH2Graph(self, x, y, pxTolerance=6):
+        z = self.pixelToComplex(x, y)
+        tolerance = pxTolerance/max(self.scaleX, self.scaleY)
+        vertex = self.sceneIndex.nearestVertex(z, tolerance)
+        if vertex >= 0:
+            return 'vertex', vertex
+        edge = self.sceneIndex.nearestEdge(z, tolerance)
+        if edge >= 0:
+            return 'edge', edge
+        return None
+
+    def playground(self, scene):
+        self.playgroundStatic(scene)
+        self.playgroundHyperbolic(scene)
+
+    def playgroundStatic(self, scene):
+        self.drawPoint(0, color='black', width=2)
+        self.drawSegment(np.exp(2*1j*np.pi/3), 1, color=QColor('red'), width=1)
+        self.drawCircle(0, 1, QColor('black'), 1)
+        self.drawGraph(scene, QColor('gray'))
+        for i in range(len(scene.pointsClicked)):
+            zi = scene.pointsClicked[i]
+            self.drawPoint(zi, color='blue', width=2)
+            if i>0:
+                ziL = scene.pointsClicked[i-1]
+                self.drawSegment(zi, ziL, color='green')
+
+    def playgroundHyperbolic(self, scene):
+        self.drawH2Graph(scene)
+        self.drawH2pointsClicked(scene)
+
+    def playgroundHyperbolicCoarse(self, scene, maxEdges):
+        drawn = self.drawCoarseH2Graph(scene, maxEdges)
+        self.drawH2pointsClicked(scene)
+        return drawn
+
+    def drawH2Delaunay(self, delaunay, color='teal', width=1, voronoiColor='purple'):
+        self.drawH2Segments(delaunay.segments(), color, width)
+        if voronoiColor is not None:
+            self.drawH2Segments(delaunay.voronoiSegments(), voronoiColor, width)
+
+    def drawH2pointsClicked(self, scene):
+        if scene.H2delaunay is not None:
+            self.drawH2Delaunay(scene.H2delaunay)
+        H2points, circles = self.kickH2pointsClicked(scene)
+        for z in H2points:
+            self.drawPoint(z, color='yellow', width=2)
+        self.drawClippedH2Segments(*self.clipH2Circles(*circles), color='orange')
+
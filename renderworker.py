@@ -0,0 +1,79 @@
+from PySide6.QtCore import QMutex, QMutexLocker, QThread, QWaitCondition, Qt, Signal
+from PySide6.QtGui import QImage
+
+from renderer import Renderer
+
+
+class RenderWorker(QThread):
+    # Rasterizes the hyperbolic layer off the GUI thread. Only the latest request is kept:
+    # a request that arrives while another is waiting replaces it. The edges are drawn batchSize
+    # at a time, and the frame being drawn is abandoned as soon as a new request or cancel() comes in.
+    frameReady = Signal(object, QImage, object)
+
+    def __init__(self, parent=None):
+        super(RenderWorker, self).__init__(parent)
+        self.mutex = QMutex()
+        self.condition = QWaitCondition()
+        self.pending = None
+        self.stopping = False
+        self.cancelled = False
+        self.batchSize = 20000
+        self.renderer = Renderer()
+        self.transformVersion = None
+
+    def request(self, key, view, transform, transformVersion, scene):
+        with QMutexLocker(self.mutex):
+            self.pending = (key, view, transform, transformVersion, scene)
+            self.condition.wakeOne()
+
+    def cancel(self):
+        # Drops the waiting request and abandons the frame being drawn
+        with QMutexLocker(self.mutex):
+            self.pending = None
+            self.cancelled = True
+
+    def isStale(self):
+        with QMutexLocker(self.mutex):
+            return self.pending is not None or self.cancelled or self.stopping
+
+    def stop(self):
+        with QMutexLocker(self.mutex):
+            self.stopping = True
+            self.condition.wakeOne()
+        self.wait()
+
+    def run(self):
+        while True:
+            self.mutex.lock()
+            while self.pending is None and not self.stopping:
+                self.condition.wait(self.mutex)
+            if self.stopping:
+                self.mutex.unlock()
+                return
+            job, self.pending, self.cancelled = self.pending, None, False
+            self.mutex.unlock()
+            frame = self.render(*job)
+            if frame is not None:
+                self.frameReady.emit(*frame)
+
+    def render(self, key, view, transform, transformVersion, scene):
+        with self.renderer.profiler.frame('worker'):
+            self.renderer.setView(view)
+            if transformVersion != self.transformVersion:
+                self.renderer.transform = transform
+                self.transformVersion = transformVersion
+            image = QImage(self.renderer.sizeX, self.renderer.sizeY, QImage.Format_ARGB32_Premultiplied)
+            image.fill(Qt.transparent)
+            self.renderer.begin(image)
+            steps = self.renderer.refineH2Graph(scene, prioritized=False)
+            done, total = next(steps)
+            while done < total and not self.isStale():
+                done, total = steps.send(self.batchSize)
+                self.renderer.flush()
+            if done >= total:
+                self.renderer.drawH2pointsClicked(scene)
+                self.renderer.flush()
+            self.renderer.end()
+        if done < total:
+            return None
+        return key, image, self.renderer.sceneIndex
@@ -0,0 +1,172 @@
+import copy
+import numpy as np
+
+from h2geometry import H2Isometry, H2Point, H2PointArray
+from sceneformat import SceneFileWriter, isSceneFile, mapSceneFile, readEdgeList
+
+
+class Scene:
+    def __init__(self):
+        self.pointsClicked = []
+        self.H2pointsClicked = []
+        # H2Delaunay of H2pointsClicked, or None when it is not shown
+        self.H2delaunay = None
+        self.vertices = np.zeros(0, dtype=np.complex128)
+        self.edges = np.zeros((0, 2), dtype=np.int64)
+        self.H2vertices = H2PointArray()
+        self.H2edges = np.zeros((0, 2), dtype=np.int64)
+        # Per-edge index into styles, a list of (color, width), or None to draw every edge alike
+        self.H2edgeStyles = None
+        self.styles = [('black', 1)]
+        self.transform = H2Isometry(1.0, 0.0)
+        self.window = None
+        self.version = 0
+        # Scene file the graph arrays are memory-mapped from, and the version the scene had when opened
+        self.path, self.pathVersion = None, None
+
+    def touch(self):
+        self.version += 1
+
+    def snapshot(self):
+        # Arrays are shared, the lists edited by Canvas are copied
+        scene = copy.copy(self)
+        scene.pointsClicked = list(self.pointsClicked)
+        scene.H2pointsClicked = list(self.H2pointsClicked)
+        if self.H2delaunay is not None:
+            scene.H2delaunay = self.H2delaunay.copy()
+        return scene
+
+    def source(self):
+        # What to send to another process: the path of the scene file while the scene is unchanged since
+        # it was opened, so that the file is mapped again instead of being copied, else the scene itself
+        if self.path is not None and self.version == self.pathVersion:
+            return self.path
+        return self
+
+    @classmethod
+    def fromSource(cls, source):
+        return cls.openBinary(source) if isinstance(source, str) else source
+
+    def setGraph(self, vertices, edges):
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.complex128)
+        self.edges = np.ascontiguousarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.touch()
+
+    def setH2Graph(self, vertices, edges, edgeStyles=None):
+        self.H2vertices = vertices
+        self.H2edges = np.ascontiguousarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.H2edgeStyles = None if edgeStyles is None else np.ascontiguousarray(edgeStyles, dtype=np.uint16)
+        self.touch()
+
+    def meta(self):
+        window = None if self.window is None else [float(x) for x in self.window]
+        u, a = complex(self.transform.u), complex(self.transform.a)
+        return {'transform': [u.real, u.imag, a.real, a.imag], 'window': window,
+                'styles': [[str(color), int(width)] for color, width in self.styles]}
+
+    def setMeta(self, meta):
+        ur, ui, ar, ai = meta['transform']
+        self.transform = H2Isometry(ur + 1j*ui, ar + 1j*ai)
+        self.window = None if meta['window'] is None else tuple(meta['window'])
+        self.styles = [tuple(style) for style in meta['styles']]
+
+    def save(self, path):
+        # .grs files are written in the memory-mapped format, anything else as .npz
+        if str(path).endswith('.grs'):
+            self.saveBinary(path)
+            return
+        window = np.zeros(0) if self.window is None else np.array(self.window, dtype=np.float64)
+        # Edge styles as in .grs files: the per-edge style ids when there are some, and the style table
+        styles = {} if self.H2edgeStyles is None else {'H2edgeStyles': self.H2edgeStyles}
+        np.savez(path, pointsClicked=np.array(self.pointsClicked, dtype=np.complex128),
+                 H2pointsClicked=H2PointArray.fromPoints(self.H2pointsClicked).z,
+                 vertices=self.vertices, edges=self.edges, H2vertices=self.H2vertices.z, H2edges=self.H2edges,
+                 transform=np.array([self.transform.u, self.transform.a], dtype=np.complex128),
+                 window=window, styleColors=np.array([str(color) for color, _ in self.styles]),
+                 styleWidths=np.array([int(width) for _, width in self.styles], dtype=np.int64), **styles)
+
+    def saveBinary(self, path):
+        writer = SceneFileWriter(path)
+        writer.addArray('pointsClicked', np.array(self.pointsClicked, dtype=np.complex128))
+        writer.addArray('H2pointsClicked', H2PointArray.fromPoints(self.H2pointsClicked).z)
+        writer.addArray('vertices', self.vertices)
+        writer.addArray('edges', self.edges)
+        writer.addArray('H2vertices', self.H2vertices.z)
+        writer.addArray('H2edges', self.H2edges)
+        if self.H2edgeStyles is not None:
+            writer.addArray('H2edgeStyles', self.H2edgeStyles)
+        writer.close(self.meta())
+
+    @classmethod
+    def openBinary(cls, path, mode='r'):
+        # The graph arrays are memory-mapped, nothing is read until it is drawn
+        arrays, meta = mapSceneFile(path, mode)
+        scene = cls()
+        scene.pointsClicked = list(arrays['pointsClicked'])
+        scene.H2pointsClicked = [H2Point(z) for z in arrays['H2pointsClicked']]
+        scene.setGraph(arrays['vertices'], arrays['edges'])
+        scene.setH2Graph(H2PointArray(arrays['H2vertices']), arrays['H2edges'], arrays.get('H2edgeStyles'))
+        scene.setMeta(meta)
+        scene.path, scene.pathVersion = str(path), scene.version
+        return scene
+
+    @classmethod
+    def importEdgeList(cls, textPath, path, base=0, radius=0.9, styles=None, chunkSize=1 << 24):
+        # Converts a whitespace separated edge list 'tail head [style]' into a scene file, one chunk at a
+        # time. Vertices are numbered from base and placed on a circle of the given radius.
+        writer = SceneFileWriter(path)
+        try:
+            for name in ['pointsClicked', 'H2pointsClicked', 'vertices']:
+                writer.addArray(name, np.zeros(0, dtype=np.complex128))
+            writer.addArray('edges', np.zeros((0, 2), dtype=np.int64))
+            writer.beginArray('H2edges', np.int64, (2,))
+            nbVertices, nbColumns = 0, 2
+            for chunk in readEdgeList(textPath, chunkSize):
+                if chunk.shape[1] < 2:
+                    raise ValueError('{} has {} column, an edge needs a tail and a head'.format(textPath, chunk.shape[1]))
+                edges = chunk[:, :2] - base
+                if edges.shape[0] > 0 and edges.min() < 0:
+                    raise ValueError('{} has vertex id {}, below the first id {}'.format(textPath, edges.min() + base, base))
+                writer.appendRows(edges)
+                nbVertices = max(nbVertices, int(edges.max(initial=-1)) + 1)
+                nbColumns = chunk.shape[1]
+            if nbColumns > 2:
+                writer.beginArray('H2edgeStyles', np.uint16)
+                limit = np.iinfo(np.uint16).max
+                for chunk in readEdgeList(textPath, chunkSize):
+                    styleIds = chunk[:, 2]
+                    outside = styleIds[(styleIds < 0) | (styleIds > limit)]
+                    if outside.shape[0] > 0:
+                        raise ValueError('{} has style id {}, style ids go from 0 to {}'.format(textPath, outside[0], limit))
+                    writer.appendRows(styleIds)
+            writer.beginArray('H2vertices', np.complex128)
+            step = max(chunkSize//16, 1)
+            for start in range(0, nbVertices, step):
+                writer.appendRows(radius*np.exp(2j*np.pi*np.arange(start, min(start + step, nbVertices))/nbVertices))
+        except Exception:
+            writer.abort()
+            raise
+        scene = cls()
+        if styles is not None:
+            scene.styles = styles
+        writer.close(scene.meta())
+        return cls.openBinary(path)
+
+    @classmethod
+    def load(cls, path):
+        if isSceneFile(path):
+            return cls.openBinary(path)
+        scene = cls()
+        with np.load(path) as data:
+            scene.pointsClicked = list(data['pointsClicked'])
+            scene.H2pointsClicked = [H2Point(z) for z in data['H2pointsClicked']]
+            if 'vertices' in data:
+                scene.setGraph(data['vertices'], data['edges'])
+            scene.setH2Graph(H2PointArray(data['H2vertices']), data['H2edges'], data['H2edgeStyles'] if 'H2edgeStyles' in data else None)
+            if 'styleColors' in data:
+                scene.styles = [(str(color), int(width)) for color, width in zip(data['styleColors'], data['styleWidths'])]
+            u, a = data['transform']
+            scene.transform = H2Isometry(u, a)
+            if data['window'].shape[0] == 4:
+                scene.window = tuple(data['window'])
+        return scene
@@ -0,0 +1,134 @@
+import io, json, os, struct, warnings
+import numpy as np
+
+# Layout: magic, offset of the JSON header (uint64), then the arrays, each aligned on ALIGNMENT bytes,
+# then the header. The header lists the arrays (dtype, shape, offset) and the other scene fields, so
+# every array can be opened with numpy.memmap without reading or copying it.
+MAGIC = b'GRSCENE1'
+ALIGNMENT = 64
+
+
+class SceneFileWriter:
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + struct.pack('<Q', 0))
+        self.arrays = {}
+        self.current = None
+
+    def align(self):
+        padding = -self.file.tell() % ALIGNMENT
+        self.file.write(b'\0'*padding)
+
+    def beginArray(self, name, dtype, rowShape=()):
+        # The array is then written in chunks of rows with appendRows
+        self.align()
+        self.current = name
+        self.arrays[name] = {'dtype': np.dtype(dtype).str, 'shape': [0] + list(rowShape), 'offset': self.file.tell()}
+
+    def appendRows(self, rows):
+        entry = self.arrays[self.current]
+        rows = np.ascontiguousarray(rows, dtype=entry['dtype'])
+        self.file.write(rows.tobytes())
+        entry['shape'][0] += rows.shape[0]
+
+    def addArray(self, name, array):
+        array = np.asarray(array)
+        self.beginArray(name, array.dtype, array.shape[1:])
+        self.appendRows(array)
+
+    def abort(self):
+        # Closes and removes an incomplete file
+        self.file.close()
+        os.remove(self.file.name)
+
+    def close(self, meta):
+        headerOffset = self.file.tell()
+        self.file.write(json.dumps(dict(meta, arrays=self.arrays)).encode())
+        self.file.seek(len(MAGIC))
+        self.file.write(struct.pack('<Q', headerOffset))
+        self.file.close()
+
+
+def isSceneFile(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def mapSceneFile(path, mode='r'):
+    # Returns ({name: numpy.memmap}, meta). mode 'r' is read-only, 'c' is copy-on-write.
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a scene file'.format(path))
+        headerOffset, = struct.unpack('<Q', f.read(8))
+        f.seek(headerOffset)
+        meta = json.loads(f.read().decode())
+    arrays = {}
+    for name, entry in meta.pop('arrays').items():
+        shape = tuple(entry['shape'])
+        if np.prod(shape) == 0:
+            arrays[name] = np.zeros(shape, dtype=entry['dtype'])
+        else:
+            arrays[name] = np.memmap(path, dtype=entry['dtype'], mode=mode, offset=entry['offset'], shape=shape)
+    return arrays, meta
+
+
+def edgeFields(line):
+    # Fields of an edge list line once its '#' or '%' comment is removed
+    return line.split(b'#')[0].split(b'%')[0].split()
+
+def badEdgeLine(chunk, nbColumns, firstLine):
+    # Number and content of the first line of chunk that is neither blank nor nbColumns integers, comments aside
+    for number, line in enumerate(chunk.splitlines(), firstLine):
+        fields = edgeFields(line)
+        if not fields:
+            continue
+        try:
+            [int(field) for field in fields]
+        except ValueError:
+            return number, line
+        if len(fields) != nbColumns:
+            return number, line
+    return None
+
+def parseEdgeChunk(chunk, nbColumns, firstLine=1):
+    # (n, nbColumns) int64 rows of a chunk of whole lines, '#' and '%' comment lines are skipped.
+    # firstLine is the line number of the start of chunk in the file, for error messages.
+    try:
+        with warnings.catch_warnings():
+            # A chunk of comment lines only is not an error
+            warnings.simplefilter('ignore', UserWarning)
+            # '%' comments are turned into '#' ones, loadtxt is much slower with several comment markers
+            values = np.loadtxt(io.BytesIO(chunk.replace(b'%', b'#')), dtype=np.int64, comments='#', ndmin=2)
+    except ValueError:
+        values = None
+    if values is None or (values.shape[0] > 0 and values.shape[1] != nbColumns):
+        bad = badEdgeLine(chunk, nbColumns, firstLine)
+        if bad is None:
+            raise ValueError('Could not parse the edge list lines {} to {}'.format(firstLine, firstLine + chunk.count(b'\n')))
+        raise ValueError('Line {} of the edge list is not {} integers: {!r}'.format(bad[0], nbColumns, bad[1].decode(errors='replace')))
+    return values.reshape(-1, nbColumns)
+
+def readEdgeList(path, chunkSize=1 << 24):
+    # Yields (n, 2) or (n, 3) int64 arrays (tail, head[, style]) parsed one chunk of lines at a time,
+    # skipping '#' and '%' comment lines. The number of columns is that of the first data line, a line
+    # with another number of columns or a field that is not an integer raises ValueError.
+    nbColumns = None
+    rest = b''
+    firstLine = 1
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(chunkSize)
+            data = rest + block
+            if block:
+                cut = data.rfind(b'\n') + 1
+                data, rest = data[:cut], data[cut:]
+            if nbColumns is None:
+                for line in data.splitlines():
+                    fields = edgeFields(line)
+                    if fields:
+                        nbColumns = len(fields)
+                        break
+            if nbColumns is not None and data.strip():
+                yield parseEdgeChunk(data, nbColumns, firstLine)
+            firstLine += data.count(b'\n')
+            if not block:
+                return
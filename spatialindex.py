@@ -0,0 +1,201 @@
+import numpy as np
+
+from toolkit import qnorm, liesOnSmallerArcArray
+from h2geometry import H2PointArray, H2SegmentArray
+
+
+class GridLevel:
+    # Uniform grid over a fixed rectangle, each cell stores the items whose bounding box meets it
+    def __init__(self, xMin, yMin, xMax, yMax, boxes, items, resolution):
+        self.resolution = resolution
+        self.xMin, self.yMin = xMin, yMin
+        self.cellX, self.cellY = (xMax - xMin)/resolution, (yMax - yMin)/resolution
+
+        i0, j0 = self.cellOf(boxes[items, 0], boxes[items, 1])
+        i1, j1 = self.cellOf(boxes[items, 2], boxes[items, 3])
+        spanX, spanY = i1 - i0 + 1, j1 - j0 + 1
+        counts = spanX*spanY
+        repeated = np.repeat(items, counts)
+        offsets = np.arange(repeated.shape[0]) - np.repeat(np.cumsum(counts) - counts, counts)
+        sX = np.repeat(spanX, counts)
+        ci = np.repeat(i0, counts) + offsets % sX
+        cj = np.repeat(j0, counts) + offsets // sX
+        cells = cj*resolution + ci
+        order = np.argsort(cells, kind='stable')
+        self.items = repeated[order]
+        self.cellStart = np.searchsorted(cells[order], np.arange(resolution*resolution + 1))
+
+    def cellOf(self, x, y):
+        i = np.clip(np.floor((x - self.xMin)/self.cellX), 0, self.resolution - 1).astype(np.int64)
+        j = np.clip(np.floor((y - self.yMin)/self.cellY), 0, self.resolution - 1).astype(np.int64)
+        return i, j
+
+    def candidates(self, xMin, yMin, xMax, yMax):
+        (i0, i1), (j0, j1) = self.cellOf(np.array([xMin, xMax]), np.array([yMin, yMax]))
+        res = self.resolution
+        # The cells i0..i1 of one row are consecutive, so their items form a single slice
+        return [self.items[self.cellStart[j*res + i0]:self.cellStart[j*res + i1 + 1]] for j in range(j0, j1 + 1)]
+
+
+class GridIndex:
+    # Pyramid of grids with resolutions 1, 2, 4, ... Each item goes to the finest level whose cells
+    # are at least as large as its bounding box, so it is stored in at most 4 cells.
+    def __init__(self, xMin, yMin, xMax, yMax, boxes, maxLevel=None):
+        n = boxes.shape[0]
+        if maxLevel is None:
+            maxLevel = int(np.clip(np.ceil(0.5*np.log2(max(n, 1))), 0, 10))
+        self.xMin, self.yMin, self.xMax, self.yMax = xMin, yMin, xMax, yMax
+        self.boxes = boxes
+        size = np.maximum((boxes[:, 2] - boxes[:, 0])/(xMax - xMin), (boxes[:, 3] - boxes[:, 1])/(yMax - yMin))
+        with np.errstate(divide='ignore'):
+            level = np.clip(np.floor(-np.log2(size)), 0, maxLevel).astype(np.int64)
+        self.levels = []
+        for l in range(maxLevel + 1):
+            items = np.flatnonzero(level == l)
+            if items.shape[0] > 0:
+                self.levels.append(GridLevel(xMin, yMin, xMax, yMax, boxes, items, 2**l))
+        self.cellSize = min(xMax - xMin, yMax - yMin)/2**maxLevel
+
+    def candidates(self, xMin, yMin, xMax, yMax):
+        chunks = [np.zeros(0, dtype=np.int64)]
+        for level in self.levels:
+            chunks.extend(level.candidates(xMin, yMin, xMax, yMax))
+        return np.unique(np.concatenate(chunks))
+
+    def query(self, xMin, yMin, xMax, yMax):
+        candidates = self.candidates(xMin, yMin, xMax, yMax)
+        b = self.boxes[candidates]
+        overlap = (b[:, 0] <= xMax) & (b[:, 2] >= xMin) & (b[:, 1] <= yMax) & (b[:, 3] >= yMin)
+        return candidates[overlap]
+
+    def nearest(self, z, distances, maxDistance=np.inf):
+        # distances(items) returns the exact distance from z to each item
+        radius = min(self.cellSize, maxDistance)
+        while True:
+            items = self.query(z.real - radius, z.imag - radius, z.real + radius, z.imag + radius)
+            if items.shape[0] > 0:
+                d = distances(items)
+                k = np.argmin(d)
+                if d[k] <= radius:
+                    return items[k], d[k]
+            if radius >= maxDistance or radius > (self.xMax - self.xMin) + (self.yMax - self.yMin):
+                return -1, np.inf
+            radius = min(2*radius, maxDistance)
+
+
+def arcBoundingBoxes(straight, c, r, z1, z2):
+    xMin, xMax = np.minimum(z1.real, z2.real), np.maximum(z1.real, z2.real)
+    yMin, yMax = np.minimum(z1.imag, z2.imag), np.maximum(z1.imag, z2.imag)
+    arcs = np.flatnonzero(~straight)
+    ca, ra, z1a, z2a = c[arcs], r[arcs], z1[arcs], z2[arcs]
+    for direction in [1.0, -1.0, 1j, -1j]:
+        extreme = ca + ra*direction
+        onArc = liesOnSmallerArcArray(extreme, ca, z1a, z2a)
+        hit = arcs[onArc]
+        xMin[hit] = np.minimum(xMin[hit], extreme.real[onArc])
+        xMax[hit] = np.maximum(xMax[hit], extreme.real[onArc])
+        yMin[hit] = np.minimum(yMin[hit], extreme.imag[onArc])
+        yMax[hit] = np.maximum(yMax[hit], extreme.imag[onArc])
+    return np.column_stack((xMin, yMin, xMax, yMax))
+
+def chordBoundingBoxes(z1, z2):
+    # The smaller arc of a geodesic of the disk is at most a half circle, so it stays within half the
+    # chord length of the chord
+    pad = 0.5*np.abs(z2 - z1)
+    return np.column_stack((np.minimum(z1.real, z2.real) - pad, np.minimum(z1.imag, z2.imag) - pad,
+                            np.maximum(z1.real, z2.real) + pad, np.maximum(z1.imag, z2.imag) + pad))
+
+def distanceToSegments(z, z1, z2):
+    d = z2 - z1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip(((z - z1)*np.conj(d)).real/qnorm(d), 0.0, 1.0)
+    t = np.where(np.isnan(t), 0.0, t)
+    return np.abs(z - (z1 + t*d))
+
+def distanceToArcs(z, straight, c, r, z1, z2):
+    distances = distanceToSegments(z, z1, z2)
+    arcs = np.flatnonzero(~straight)
+    ca, ra, z1a, z2a = c[arcs], r[arcs], z1[arcs], z2[arcs]
+    u = z - ca
+    with np.errstate(divide='ignore', invalid='ignore'):
+        projection = ca + ra*u/np.abs(u)
+    onArc = liesOnSmallerArcArray(projection, ca, z1a, z2a)
+    toEnds = np.minimum(np.abs(z - z1a), np.abs(z - z2a))
+    distances[arcs] = np.where(onArc, np.abs(np.abs(u) - ra), toEnds)
+    return distances
+
+
+class H2SceneIndex:
+    # Index over the transformed (disk space) vertices and geodesic edges of a scene graph. The circles
+    # of the edges are only computed for the edges that need them: the ones drawn as arcs, the picking
+    # candidates, and the edges longer than exactBoxLength, whose grid boxes are their arc boxes. They
+    # are kept with the index, so that views of the same transform compute each circle once.
+    exactBoxLength = 1e-2
+
+    def __init__(self, vertices, z1, z2, lazy=False):
+        # With lazy, the grids are only built on the first query that needs them
+        self.vertices = vertices
+        self.z1, self.z2 = z1, z2
+        self.vertexGridCache, self.edgeGridCache = None, None
+        # Circles of the edges whose computed flag is set, allocated by the first edgeGeometry call
+        self.straight, self.c, self.r, self.computed = None, None, None, None
+        if not lazy:
+            self.build()
+
+    def build(self):
+        # Builds both grids now rather than on the first query
+        self.vertexGridCache, self.edgeGridCache = self.buildVertexGrid(), self.buildEdgeGrid()
+
+    def buildVertexGrid(self):
+        vertices = self.vertices
+        return GridIndex(-1.0, -1.0, 1.0, 1.0, np.column_stack((vertices.real, vertices.imag, vertices.real, vertices.imag)))
+
+    def buildEdgeGrid(self):
+        boxes = chordBoundingBoxes(self.z1, self.z2)
+        long = np.flatnonzero(np.abs(self.z2 - self.z1) >= self.exactBoxLength)
+        boxes[long] = arcBoundingBoxes(*self.edgeGeometry(long))
+        return GridIndex(-1.0, -1.0, 1.0, 1.0, boxes)
+
+    @property
+    def vertexGrid(self):
+        if self.vertexGridCache is None:
+            self.vertexGridCache = self.buildVertexGrid()
+        return self.vertexGridCache
+
+    @property
+    def edgeGrid(self):
+        if self.edgeGridCache is None:
+            self.edgeGridCache = self.buildEdgeGrid()
+        return self.edgeGridCache
+
+    @classmethod
+    def empty(cls):
+        noPoints = np.zeros(0, dtype=np.complex128)
+        return cls(noPoints, noPoints, noPoints)
+
+    def edgeGeometry(self, edges):
+        edges = np.asarray(edges, dtype=np.int64)
+        if self.computed is None:
+            n = self.z1.shape[0]
+            self.straight, self.c, self.r = np.zeros(n, dtype=bool), np.zeros(n, dtype=np.complex128), np.zeros(n)
+            self.computed = np.zeros(n, dtype=bool)
+        missing = edges[~self.computed[edges]]
+        if missing.shape[0] > 0:
+            straight, c, r, _, _ = H2SegmentArray(H2PointArray(self.z1[missing]), H2PointArray(self.z2[missing])).getCirclesAndEndpoints()
+            self.straight[missing], self.c[missing], self.r[missing] = straight, c, r
+            self.computed[missing] = True
+        return self.straight[edges], self.c[edges], self.r[edges], self.z1[edges], self.z2[edges]
+
+    def edgesInRect(self, xMin, yMin, xMax, yMax):
+        if xMin <= -1.0 and yMin <= -1.0 and xMax >= 1.0 and yMax >= 1.0:
+            # Every geodesic is in the closed disk
+            return np.arange(self.z1.shape[0])
+        return self.edgeGrid.query(xMin, yMin, xMax, yMax)
+
+    def nearestVertex(self, z, maxDistance=np.inf):
+        vertex, _ = self.vertexGrid.nearest(z, lambda items: np.abs(self.vertices[items] - z), maxDistance)
+        return vertex
+
+    def nearestEdge(self, z, maxDistance=np.inf):
+        edge, _ = self.edgeGrid.nearest(z, lambda items: distanceToArcs(z, *self.edgeGeometry(items)), maxDistance)
+        return edge
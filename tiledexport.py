@@ -0,0 +1,92 @@
+import multiprocessing, os, struct, zlib
+import numpy as np
+
+from PySide6.QtGui import QGuiApplication, QImage
+
+from renderer import Renderer
+from scene import Scene
+
+
+def tileViews(view, tileSize):
+    # Splits a view (Renderer.viewKey) into rows of tiles, each with the window it covers in the full image
+    xMin, yMax, scaleX, scaleY, sizeX, sizeY = view
+    rows = []
+    for y0 in range(0, sizeY, tileSize):
+        h = min(tileSize, sizeY - y0)
+        rows.append([(x0, y0, (xMin + x0/scaleX, yMax - y0/scaleY, scaleX, scaleY, min(tileSize, sizeX - x0), h))
+                     for x0 in range(0, sizeX, tileSize)])
+    return rows
+
+
+class PngWriter:
+    # Writes an RGB PNG strip by strip, so only the rows being written are held in memory
+    def __init__(self, path, width, height, level=6):
+        self.file = open(path, 'wb')
+        self.width, self.height = width, height
+        self.compressor = zlib.compressobj(level)
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self.writeChunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def writeChunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)) + kind + data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xffffffff))
+
+    def writeRows(self, rows):
+        # rows: (h, width, 3) uint8, each row gets the filter type byte 0
+        filtered = np.zeros((rows.shape[0], 1 + 3*self.width), dtype=np.uint8)
+        filtered[:, 1:] = rows.reshape(rows.shape[0], -1)
+        data = self.compressor.compress(filtered.tobytes())
+        if data:
+            self.writeChunk(b'IDAT', data)
+
+    def close(self):
+        self.writeChunk(b'IDAT', self.compressor.flush())
+        self.writeChunk(b'IEND', b'')
+        self.file.close()
+
+
+workerApp, workerRenderer, workerScene = None, None, None
+
+def initWorker(source, transform):
+    # source is Scene.source(): scene files are mapped by each process rather than copied to it
+    global workerApp, workerRenderer, workerScene
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    if QGuiApplication.instance() is None:
+        workerApp = QGuiApplication([])
+    workerRenderer, workerScene = Renderer(), Scene.fromSource(source)
+    workerRenderer.transform = transform
+
+def renderTile(tile):
+    # The renderer is kept between tiles, so the disk space geometry of the scene is computed once per process
+    x0, y0, view = tile
+    workerRenderer.setView(view)
+    image = QImage(view[4], view[5], QImage.Format_RGB32)
+    workerRenderer.render(image, workerScene)
+    image = image.convertToFormat(QImage.Format_RGB888)
+    pixels = np.frombuffer(image.constBits(), dtype=np.uint8).reshape(view[5], image.bytesPerLine())
+    return x0, y0, pixels[:, :3*view[4]].reshape(view[5], view[4], 3).copy()
+
+def renderTiled(scene, view, path, tileSize=2048, processes=None):
+    # Renders the view of a full size Renderer tile by tile in a pool of headless processes and writes
+    # each completed row of tiles to the PNG. Memory use is one row of tiles, whatever the image size.
+    sizeX, sizeY = view[4], view[5]
+    rows = tileViews(view, tileSize)
+    writer = PngWriter(path, sizeX, sizeY)
+    try:
+        if processes == 1:
+            initWorker(scene, scene.transform)
+            tiles = (renderTile(tile) for row in rows for tile in row)
+            pool = None
+        else:
+            pool = multiprocessing.get_context('spawn').Pool(processes, initWorker, (scene.source(), scene.transform))
+            tiles = pool.imap(renderTile, [tile for row in rows for tile in row])
+        for row in rows:
+            strip = np.empty((row[0][2][5], sizeX, 3), dtype=np.uint8)
+            for _ in row:
+                x0, _, pixels = next(tiles)
+                strip[:, x0:x0 + pixels.shape[1]] = pixels
+            writer.writeRows(strip)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        writer.close()
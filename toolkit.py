@@ -5,6 +5,16 @@ def mod2pi(t):
     if t<0:
         q -= 1
     return t - 2*np.pi*q
+
+def mod2piArray(t):
+    return np.mod(t, 2*np.pi)
     
 def qnorm(z):
     return z.real*z.real+z.imag*z.imag
+
+def liesOnSmallerArcArray(z, center, endpoint1, endpoint2):
+    u, u1, u2 = z - center, endpoint1 - center, endpoint2 - center
+    v, v2 = u*np.conj(u1), u2*np.conj(u1)
+    onLeft = (v.imag >= 0) & (v.real >= v2.real)
+    onRight = (v.imag <= 0) & (v.real >= v2.real)
+    return np.where(v2.imag > 0, onLeft, onRight)
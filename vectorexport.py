@@ -0,0 +1,221 @@
+import os, zlib
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+
+def arcEndpoints(arcs):
+    # Start and end points of Qt arcs (x, y, w, h, 16*startAngle, 16*span), angles counterclockwise on screen
+    X, Y, W, H = arcs[:, 0], arcs[:, 1], arcs[:, 2], arcs[:, 3]
+    start, end = arcs[:, 4]*np.pi/(180*16), (arcs[:, 4] + arcs[:, 5])*np.pi/(180*16)
+    cx, cy, rx, ry = X + 0.5*W, Y + 0.5*H, 0.5*np.abs(W), 0.5*np.abs(H)
+    return cx + rx*np.cos(start), cy - ry*np.sin(start), cx + rx*np.cos(end), cy - ry*np.sin(end)
+
+def arcBeziers(arcs, pieces=4):
+    # Each arc split into pieces cubic Bezier curves, as rows (x0, y0, x1, y1, x2, y2, x3, y3)
+    X, Y, W, H = arcs[:, 0], arcs[:, 1], arcs[:, 2], arcs[:, 3]
+    cx, cy, rx, ry = X + 0.5*W, Y + 0.5*H, 0.5*np.abs(W), 0.5*np.abs(H)
+    start, span = arcs[:, 4]*np.pi/(180*16), arcs[:, 5]*np.pi/(180*16)
+    t0 = start[:, None] + span[:, None]*np.arange(pieces)/pieces
+    t1 = t0 + (span/pieces)[:, None]
+    k = (4.0/3.0)*np.tan((span/pieces)/4.0)[:, None]
+    cx, cy, rx, ry = cx[:, None], cy[:, None], rx[:, None], ry[:, None]
+    x0, y0 = cx + rx*np.cos(t0), cy - ry*np.sin(t0)
+    x3, y3 = cx + rx*np.cos(t1), cy - ry*np.sin(t1)
+    x1, y1 = x0 - k*rx*np.sin(t0), y0 - k*ry*np.cos(t0)
+    x2, y2 = x3 + k*rx*np.sin(t1), y3 + k*ry*np.cos(t1)
+    return np.stack((x0, y0, x1, y1, x2, y2, x3, y3), axis=-1).reshape(-1, 8)
+
+def pdfString(text):
+    # Literal string with backslashes and parentheses escaped, or UTF-16 hex string when text is not ASCII
+    if text.isascii():
+        return '({})'.format(text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)'))
+    return '<FEFF{}>'.format(text.encode('utf-16-be').hex().upper())
+
+def formatRows(pattern, rows):
+    # One %-format for a whole chunk instead of one per primitive
+    return (pattern*rows.shape[0]) % tuple(rows.ravel().tolist())
+
+
+class VectorWriter:
+    # Writes the style groups of a DrawList as they are flushed, chunkSize primitives at a time.
+    # output is a path or a file-like object, which is then left open.
+    chunkSize = 10000
+
+    def __init__(self, output, sizeX, sizeY, title='Graph Rep', precision=1):
+        self.output = output
+        self.sizeX, self.sizeY = sizeX, sizeY
+        self.title = title
+        self.precision = precision
+        self.file = None
+
+    def integers(self, *columns):
+        # Coordinates are written as integers in units of 10**-precision pixels
+        return np.rint(np.column_stack(columns)*10**self.precision).astype(np.int64)
+
+    def open(self, mode):
+        if isinstance(self.output, (str, bytes, os.PathLike)):
+            self.file = open(self.output, mode)
+        else:
+            self.file = self.output
+
+    def close(self):
+        if self.file is not self.output:
+            self.file.close()
+        self.file = None
+
+    def chunks(self, rows):
+        for start in range(0, rows.shape[0], self.chunkSize):
+            yield rows[start:start + self.chunkSize]
+
+    def writeGroup(self, group):
+        # Density rasters are written as their distinct pixels
+        points = group.pointArray()
+        if group.density:
+            points = np.concatenate([points] + [np.unique(d, axis=0) for d in group.density])
+        self.beginStyle(group.color, group.width)
+        for rows in self.chunks(points):
+            self.writePoints(rows)
+        for rows in self.chunks(group.lineArray()):
+            self.writeLines(rows)
+        for rows in self.chunks(group.arcArray()):
+            self.writeArcs(rows)
+        for rows in self.chunks(group.ellipseArray()):
+            self.writeEllipses(rows)
+        self.endStyle()
+
+
+class SvgWriter(VectorWriter):
+    # Lines and points as relative path commands and arcs as exact elliptical arc commands, one <g>
+    # per style. The viewBox is scaled so that coordinates are integers.
+    def begin(self):
+        self.open('w')
+        unit = 10**self.precision
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {2} {3}">\n'
+                        '<title>{4}</title>\n'.format(self.sizeX, self.sizeY, unit*self.sizeX, unit*self.sizeY, escape(self.title)))
+
+    def end(self):
+        self.file.write('</svg>\n')
+        self.close()
+
+    def beginStyle(self, color, width):
+        opacity = '' if color.alpha() == 255 else ' stroke-opacity="{:.3g}"'.format(color.alphaF())
+        self.file.write('<g fill="none" stroke="{}"{} stroke-width="{}" stroke-linecap="round">\n'.format(
+            color.name(), opacity, max(width, 1)*10**self.precision))
+
+    def endStyle(self):
+        self.file.write('</g>\n')
+
+    def writePath(self, d):
+        self.file.write('<path d="{}"/>\n'.format(d))
+
+    def writePoints(self, rows):
+        self.writePath(formatRows('M%d %dh0', self.integers(rows)))
+
+    def writeLines(self, rows):
+        start, end = self.integers(rows[:, :2]), self.integers(rows[:, 2:4])
+        self.writePath(formatRows('M%d %dl%d %d', np.column_stack((start, end - start))))
+
+    def writeArcs(self, rows):
+        x1, y1, x2, y2 = arcEndpoints(rows)
+        start, end = self.integers(x1, y1), self.integers(x2, y2)
+        radii = self.integers(0.5*np.abs(rows[:, 2]), 0.5*np.abs(rows[:, 3]))
+        span = rows[:, 5]/16.0
+        large, sweep = np.abs(span) > 180, span < 0
+        arcs = np.column_stack((start, radii, large, sweep, end - start))
+        self.writePath(formatRows('M%d %da%d %d 0 %d %d %d %d', arcs))
+
+    def writeEllipses(self, rows):
+        X, Y, W, H = rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3]
+        right, radii, diameter = self.integers(X + W, Y + 0.5*H), self.integers(0.5*np.abs(W), 0.5*np.abs(H)), self.integers(W)
+        ellipses = np.column_stack((right, radii, -diameter, radii, diameter))
+        self.writePath(formatRows('M%d %da%d %d 0 1 0 %d 0a%d %d 0 1 0 %d 0', ellipses))
+
+
+class PdfWriter(VectorWriter):
+    # Single page PDF whose content stream is compressed as it is written. PDF has no arc operator,
+    # arcs and ellipses are cubic Bezier curves (four per arc, error below 3e-4 times the radius).
+    def begin(self):
+        self.open('wb')
+        self.offsets = []
+        self.position = 0
+        self.compressor = zlib.compressobj()
+        self.streamLength = 0
+        self.writeBytes(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.writeObject(b'<< /Type /Catalog /Pages 2 0 R >>')
+        self.writeObject(b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>')
+        self.writeObject('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {} {}] /Contents 4 0 R /Resources << >> >>'.format(
+            self.sizeX, self.sizeY).encode())
+        self.startObject()
+        self.writeBytes(b'<< /Length 5 0 R /Filter /FlateDecode >>\nstream\n')
+        # Pixel coordinates in units of 10**-precision, y pointing down
+        unit = 10.0**-self.precision
+        self.writeContent('{0:g} 0 0 {1:g} 0 {2} cm 1 J 1 j\n'.format(unit, -unit, self.sizeY))
+
+    def end(self):
+        tail = self.compressor.flush()
+        self.streamLength += len(tail)
+        self.writeBytes(tail)
+        self.writeBytes(b'\nendstream\nendobj\n')
+        self.writeObject(str(self.streamLength).encode())
+        self.writeObject('<< /Title {} >>'.format(pdfString(self.title)).encode())
+        xref = self.position
+        self.writeBytes('xref\n0 {}\n0000000000 65535 f \n'.format(len(self.offsets) + 1).encode())
+        self.writeBytes(''.join('{:010d} 00000 n \n'.format(offset) for offset in self.offsets).encode())
+        self.writeBytes('trailer\n<< /Size {} /Root 1 0 R /Info {} 0 R >>\nstartxref\n{}\n%%EOF\n'.format(
+            len(self.offsets) + 1, len(self.offsets), xref).encode())
+        self.close()
+
+    def writeBytes(self, data):
+        self.file.write(data)
+        self.position += len(data)
+
+    def startObject(self):
+        self.offsets.append(self.position)
+        self.writeBytes('{} 0 obj\n'.format(len(self.offsets)).encode())
+
+    def writeObject(self, body):
+        self.startObject()
+        self.writeBytes(body + b'\nendobj\n')
+
+    def writeContent(self, text):
+        data = self.compressor.compress(text.encode())
+        self.streamLength += len(data)
+        self.writeBytes(data)
+
+    def beginStyle(self, color, width):
+        # Without an ExtGState, translucent colors are written opaque
+        self.writeContent('{:.3f} {:.3f} {:.3f} RG {} w\n'.format(color.redF(), color.greenF(), color.blueF(),
+                                                                   max(width, 1)*10**self.precision))
+
+    def endStyle(self):
+        pass
+
+    def writePoints(self, rows):
+        self.writeContent(formatRows('%d %d m %d %d l\n', self.integers(rows[:, [0, 1, 0, 1]])) + 'S\n')
+
+    def writeLines(self, rows):
+        self.writeContent(formatRows('%d %d m %d %d l\n', self.integers(rows)) + 'S\n')
+
+    def writeBeziers(self, curves, pieces):
+        pattern = '%d %d m\n' + pieces*'%d %d %d %d %d %d c\n'
+        rows = curves.reshape(-1, pieces, 8)
+        rows = np.concatenate((rows[:, 0, :2], rows[:, :, 2:].reshape(-1, 6*pieces)), axis=1)
+        self.writeContent(formatRows(pattern, self.integers(rows)) + 'S\n')
+
+    def writeArcs(self, rows):
+        self.writeBeziers(arcBeziers(rows), 4)
+
+    def writeEllipses(self, rows):
+        full = np.column_stack((rows, np.zeros(rows.shape[0]), np.full(rows.shape[0], 360*16)))
+        self.writeBeziers(arcBeziers(full), 4)
+
+
+def vectorWriter(path, sizeX, sizeY, **kwargs):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.svg':
+        return SvgWriter(path, sizeX, sizeY, **kwargs)
+    if extension == '.pdf':
+        return PdfWriter(path, sizeX, sizeY, **kwargs)
+    raise ValueError('No vector format for {}'.format(path))